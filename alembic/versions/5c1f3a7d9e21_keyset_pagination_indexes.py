@@ -0,0 +1,36 @@
+"""feat: Add composite indexes for keyset pagination
+
+- Added `ix_blog_posts_created_at_post_id` for paging through `blog_posts`.
+- Added `ix_comments_blog_post_id_created_at_comment_id` for paging through the comments of a post.
+- Added `ix_posts_likes_blog_post_id_created_at_id` and `ix_comments_likes_comment_id_created_at_id` for paging through likers.
+
+Revision ID: 5c1f3a7d9e21
+Revises: 10240b4e307f
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f3a7d9e21'
+down_revision: Union[str, None] = '10240b4e307f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_blog_posts_created_at_post_id', 'blog_posts', ['created_at', 'post_id'])
+    op.create_index('ix_comments_blog_post_id_created_at_comment_id', 'comments', ['blog_post_id', 'created_at', 'comment_id'])
+    op.create_index('ix_posts_likes_blog_post_id_created_at_id', 'posts_likes', ['blog_post_id', 'created_at', 'id'])
+    op.create_index('ix_comments_likes_comment_id_created_at_id', 'comments_likes', ['comment_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_likes_comment_id_created_at_id', table_name='comments_likes')
+    op.drop_index('ix_posts_likes_blog_post_id_created_at_id', table_name='posts_likes')
+    op.drop_index('ix_comments_blog_post_id_created_at_comment_id', table_name='comments')
+    op.drop_index('ix_blog_posts_created_at_post_id', table_name='blog_posts')
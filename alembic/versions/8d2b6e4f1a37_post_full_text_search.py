@@ -0,0 +1,37 @@
+"""feat: Add a maintained full-text search vector to blog_posts
+
+- Added the generated `search_vector` column, weighting the title above the content.
+- Added the GIN index `ix_blog_posts_search_vector` used by `GET /posts/?search=` and `GET /posts/search`.
+
+Adding a stored generated column rewrites `blog_posts`, so run this outside peak traffic.
+
+Revision ID: 8d2b6e4f1a37
+Revises: 5c1f3a7d9e21
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2b6e4f1a37'
+down_revision: Union[str, None] = '5c1f3a7d9e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('blog_posts', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B')",
+        persisted=True
+    ), nullable=True))
+    op.create_index('ix_blog_posts_search_vector', 'blog_posts', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blog_posts_search_vector', table_name='blog_posts')
+    op.drop_column('blog_posts', 'search_vector')
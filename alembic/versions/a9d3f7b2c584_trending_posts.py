@@ -0,0 +1,50 @@
+"""feat: Add the trending posts rollup
+
+- Created `post_trending`, the time decayed score of each post with recent likes and comments,
+  and `trending_refreshes`, the time up to which they are counted in.
+- Added `ix_posts_likes_created_at` and `ix_comments_created_at`, used to find the likes and comments
+  made since the last refresh.
+
+Revision ID: a9d3f7b2c584
+Revises: f3c8a2e6d417
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3f7b2c584'
+down_revision: Union[str, None] = 'f3c8a2e6d417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('post_trending',
+    sa.Column('blog_post_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['blog_post_id'], ['blog_posts.post_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('blog_post_id')
+    )
+    op.create_index('ix_post_trending_score', 'post_trending', ['score'])
+
+    op.create_table('trending_refreshes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_posts_likes_created_at', 'posts_likes', ['created_at'])
+    op.create_index('ix_comments_created_at', 'comments', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_created_at', table_name='comments')
+    op.drop_index('ix_posts_likes_created_at', table_name='posts_likes')
+    op.drop_table('trending_refreshes')
+    op.drop_index('ix_post_trending_score', table_name='post_trending')
+    op.drop_table('post_trending')
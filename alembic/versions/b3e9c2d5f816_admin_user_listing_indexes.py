@@ -0,0 +1,33 @@
+"""feat: Add indexes for the paginated admin user listing
+
+- Added `ix_users_created_at_user_id` for keyset pagination over `users`.
+- Added `ix_users_username_lower` and `ix_users_email_lower` (`text_pattern_ops`) for case-insensitive prefix search.
+
+Revision ID: b3e9c2d5f816
+Revises: 8d2b6e4f1a37
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e9c2d5f816'
+down_revision: Union[str, None] = '8d2b6e4f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_created_at_user_id', 'users', ['created_at', 'user_id'])
+    op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username) text_pattern_ops')])
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email) text_pattern_ops')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_index('ix_users_username_lower', table_name='users')
+    op.drop_index('ix_users_created_at_user_id', table_name='users')
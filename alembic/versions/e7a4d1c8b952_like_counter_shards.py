@@ -0,0 +1,44 @@
+"""feat: Add sharded like counters for posts and comments
+
+- Created `post_like_shards` and `comment_like_shards`, holding like count deltas spread over N rows per parent.
+  They are folded back into `blog_posts.like_count` and `comments.like_count` by the like counter compaction.
+
+Revision ID: e7a4d1c8b952
+Revises: b3e9c2d5f816
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a4d1c8b952'
+down_revision: Union[str, None] = 'b3e9c2d5f816'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('post_like_shards',
+    sa.Column('blog_post_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['blog_post_id'], ['blog_posts.post_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('blog_post_id', 'shard')
+    )
+
+    op.create_table('comment_like_shards',
+    sa.Column('comment_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['comment_id'], ['comments.comment_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('comment_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('comment_like_shards')
+    op.drop_table('post_like_shards')
@@ -0,0 +1,33 @@
+"""feat: Index the user foreign keys of posts and comments
+
+- Added `ix_blog_posts_user_id_post_id` and `ix_comments_user_id_comment_id`, used by the user export,
+  by the response cache invalidation on user changes, and by ON DELETE CASCADE when a user is deleted.
+- The other foreign keys (`comments.blog_post_id`, `posts_likes.blog_post_id`, `comments_likes.comment_id`
+  and the likes' `user_id`) already lead an index: the keyset pagination indexes and the unique constraints.
+
+Revision ID: f3c8a2e6d417
+Revises: e7a4d1c8b952
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a2e6d417'
+down_revision: Union[str, None] = 'e7a4d1c8b952'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_blog_posts_user_id_post_id', 'blog_posts', ['user_id', 'post_id'])
+    op.create_index('ix_comments_user_id_comment_id', 'comments', ['user_id', 'comment_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_user_id_comment_id', table_name='comments')
+    op.drop_index('ix_blog_posts_user_id_post_id', table_name='blog_posts')
@@ -0,0 +1,212 @@
+"""
+Bulk loads users, posts, comments and likes from NDJSON or CSV files.
+
+Rows are streamed from the file and loaded in batches: each batch is COPYed into a
+temporary staging table, then moved with one `INSERT ... SELECT ... ON CONFLICT DO NOTHING`
+so duplicates are skipped instead of failing the batch. User passwords are bcrypt hashed
+across a process pool; rows that already carry a `password_hash` are loaded as is. After
+likes are loaded, the like counters of the affected table are rebuilt.
+
+Usage:
+    python -m app.commands.bulk_import users users.ndjson
+    python -m app.commands.bulk_import posts posts.csv --batch-size 20000
+    python -m app.commands.bulk_import post_likes likes.ndjson --hash-workers 8
+
+Rows may include their primary key (e.g. `user_id`) so that later files can reference
+them; the id sequence is moved past the loaded ids afterwards.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import text
+from app import models
+from app.utils import hash_password
+from app.services.like_counter_service import post_likes, comment_likes
+
+
+class Entity:
+    def __init__(self, model, id_column, columns, like_counter=None, like_parent_id_column=None):
+        self.table = model.__table__.name
+        self.model = model
+        self.id_column = id_column
+        self.columns = columns
+        self.like_counter = like_counter
+        self.like_parent_id_column = like_parent_id_column
+
+
+ENTITIES = {
+    "users": Entity(models.User, "user_id", ["user_id", "username", "first_name", "last_name", "email", "password", "phone", "birthdate", "admin", "created_at"]),
+    "posts": Entity(models.BlogPost, "post_id", ["post_id", "user_id", "title", "content", "created_at", "updated_at"]),
+    "comments": Entity(models.Comment, "comment_id", ["comment_id", "user_id", "blog_post_id", "content", "created_at", "updated_at"]),
+    "post_likes": Entity(models.PostsLike, "id", ["user_id", "blog_post_id", "created_at"], post_likes, models.PostsLike.blog_post_id),
+    "comment_likes": Entity(models.CommentsLike, "id", ["user_id", "comment_id", "created_at"], comment_likes, models.CommentsLike.comment_id),
+}
+
+# COPY ... (FORMAT csv, NULL '\N') reads an unquoted \N as NULL.
+NULL = "\\N"
+# Key of the input line number in the rows of `read_rows`, for error messages.
+LINE = "_line"
+
+
+def read_rows(file, format: str):
+    """
+    Yields the rows of an NDJSON or CSV file as dicts, each with its line number under `LINE`.
+    """
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            # An empty CSV field is a missing value: left out, the column is NULL or its default.
+            row = {key: value for key, value in row.items() if value != ""}
+            row[LINE] = reader.line_num
+            yield row
+    else:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                row = json.loads(line)
+                row[LINE] = line_number
+                yield row
+
+
+def batches(rows, batch_size: int):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
+def check_passwords(rows):
+    for row in rows:
+        if not row.get("password") and not row.get("password_hash"):
+            raise ValueError(f"Line {row.get(LINE, '?')}: a user needs a password or a password_hash")
+
+
+def hash_passwords(rows, executor):
+    """
+    Replaces each row's plain `password` with its bcrypt hash, or takes its `password_hash` as is.
+    """
+    to_hash = [row for row in rows if not row.get("password_hash")]
+    if executor is None:
+        hashes = map(hash_password, (row["password"] for row in to_hash))
+    else:
+        hashes = executor.map(hash_password, (row["password"] for row in to_hash), chunksize=64)
+    for row, hashed in zip(to_hash, hashes):
+        row["password"] = hashed
+    for row in rows:
+        if row.get("password_hash"):
+            row["password"] = row["password_hash"]
+
+
+def copy_rows(cursor, table: str, columns, rows):
+    """
+    COPYs `rows` (dicts) into `table` through psycopg2's COPY FROM STDIN.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([NULL if row.get(column) is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def import_batch(connection, entity: Entity, rows) -> int:
+    """
+    Loads one batch in its own transaction and returns how many rows were inserted.
+
+    :param connection: A SQLAlchemy connection on the psycopg2 driver.
+    """
+    # Rows may leave out different columns. Each set of columns is loaded on its own, so the
+    # left out ones get their defaults rather than NULL.
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(column for column in entity.columns if column in row), []).append(row)
+    inserted = 0
+    with connection.begin(), connection.connection.dbapi_connection.cursor() as cursor:
+        for columns, group in groups.items():
+            column_list = ", ".join(columns)
+            cursor.execute(f"CREATE TEMP TABLE import_staging AS SELECT {column_list} FROM {entity.table} WITH NO DATA")
+            copy_rows(cursor, "import_staging", columns, group)
+            cursor.execute(f"INSERT INTO {entity.table} ({column_list}) SELECT {column_list} FROM import_staging ON CONFLICT DO NOTHING")
+            inserted += cursor.rowcount
+            cursor.execute("DROP TABLE import_staging")
+    return inserted
+
+
+def reset_sequence(connection, entity: Entity):
+    # Loaded ids bypassed the sequence, so move it past them.
+    connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{entity.table}', '{entity.id_column}'), "
+        f"(SELECT COALESCE(MAX({entity.id_column}), 0) + 1 FROM {entity.table}), false)"
+    ))
+
+
+def finish_import(connection, entity: Entity, explicit_ids: bool):
+    with connection.begin():
+        if explicit_ids:
+            reset_sequence(connection, entity)
+        if entity.like_counter is not None:
+            for statement in entity.like_counter.rebuild(entity.model, entity.like_parent_id_column):
+                connection.execute(statement)
+
+
+def import_rows(connection, entity_name: str, rows, batch_size: int = 10000, hash_workers: int = 0, log=None) -> dict:
+    """
+    Bulk loads `rows` (an iterable of dicts) into the table of `entity_name`.
+
+    :param hash_workers: Processes used to hash user passwords, 0 hashes in this process.
+    :return: How many rows were read and how many of them were inserted.
+    """
+    entity = ENTITIES[entity_name]
+    executor = ProcessPoolExecutor(max_workers=hash_workers) if hash_workers and entity_name == "users" else None
+    read = inserted = 0
+    explicit_ids = False
+    started = time.perf_counter()
+    try:
+        for batch in batches(rows, batch_size):
+            if entity_name == "users":
+                check_passwords(batch)
+                hash_passwords(batch, executor)
+            explicit_ids = explicit_ids or any(entity.id_column in row for row in batch)
+            inserted += import_batch(connection, entity, batch)
+            read += len(batch)
+            if log:
+                log(f"{entity_name}: {read} rows read, {inserted} inserted, {read / (time.perf_counter() - started):.0f} rows/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    finish_import(connection, entity, explicit_ids)
+    return {"read": read, "inserted": inserted}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import NDJSON or CSV data into the blogging platform database.")
+    parser.add_argument("entity", choices=ENTITIES)
+    parser.add_argument("path", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Defaults to the file extension, else ndjson")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count(), help="Processes hashing user passwords")
+    args = parser.parse_args(argv)
+
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    from app.database import engine
+
+    file = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    try:
+        with engine.connect() as connection:
+            result = import_rows(connection, args.entity, read_rows(file, format), args.batch_size, args.hash_workers,
+                                 log=lambda message: print(message, file=sys.stderr))
+    except ValueError as error:
+        sys.exit(f"Import stopped, batches before this one were loaded: {error}")
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Generates a synthetic dataset at production scale, replacing everything in the database.
+
+Posts get comments and likes along a Zipf distribution, so a few posts are hot and most
+are not, and comments get likes the same way. Every user shares one precomputed bcrypt
+hash of `--password`. The generator knows how many likes it gives every post and comment,
+so it writes `like_count` directly and COPYs the likes straight into their tables, with
+no per-row conflict handling and no recount afterwards.
+
+As it empties the database first, it runs only when the configured database is named with
+`--database`, or with `--yes`.
+
+Usage:
+    python -m app.commands.generate_dataset --database blogDB_bench --users 100000 --posts 1000000 --comments 3000000 --post-likes 10000000
+    python -m app.commands.generate_dataset --yes --zipf-exponent 1.2 --seed 7
+"""
+import argparse
+import array
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.utils import hash_password
+from app.commands.bulk_import import ENTITIES, batches, reset_sequence
+
+FIRST_NAMES = ["Ahmed", "Maher", "Sara", "Omar", "Lina", "Youssef", "Nour", "Karim", "Mona", "Ali"]
+LAST_NAMES = ["Hassan", "Ibrahim", "Saleh", "Mansour", "Fathy", "Nabil", "Adel", "Samir", "Zaki", "Farouk"]
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua".split()
+
+
+def zipf_counts(total: int, items: int, exponent: float, cap: int, rng: random.Random):
+    """
+    Splits `total` over `items` in proportion to 1 / rank ** exponent, with no item over `cap`.
+    Ranks are shuffled, so the hot items have random ids.
+    """
+    if total > items * cap:
+        raise ValueError(f"Cannot give {total} rows to {items} items of at most {cap} each")
+    if items == 0 or total == 0:
+        return [0] * items
+    weights = [1 / rank ** exponent for rank in range(1, items + 1)]
+    scale = total / sum(weights)
+    counts = [min(cap, int(weight * scale)) for weight in weights]
+    # Rounding down and capping leave a remainder, handed out one row at a time.
+    remainder = total - sum(counts)
+    while remainder > 0:
+        item = rng.randrange(items)
+        if counts[item] < cap:
+            counts[item] += 1
+            remainder -= 1
+    rng.shuffle(counts)
+    return counts
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+class DatasetGenerator:
+    def __init__(self, users: int, posts: int, comments: int, post_likes: int, comment_likes: int,
+                 zipf_exponent: float = 1.0, password: str = "password123", seed: int = 42):
+        self.users = users
+        self.posts = posts
+        self.comments = comments
+        self.post_likes = post_likes
+        self.comment_likes = comment_likes
+        self.zipf_exponent = zipf_exponent
+        self.password = password
+        self.rng = random.Random(seed)
+        self.start = datetime(2024, 1, 1)
+        self.span_seconds = 365 * 24 * 3600
+
+    def offset(self, index: int, count: int) -> float:
+        # Ids and creation times grow together, as they do in production.
+        return self.span_seconds * index / max(count, 1)
+
+    def later(self, offset: float) -> float:
+        # A random time between `offset` and the end of the span, for rows made after their parent.
+        return offset + self.rng.random() * (self.span_seconds - offset)
+
+    def timestamp(self, offset: float) -> datetime:
+        return self.start + timedelta(seconds=offset)
+
+    def post_offsets(self):
+        return array.array("d", (self.offset(post_id, self.posts) for post_id in range(1, self.posts + 1)))
+
+    def comment_offsets(self, comments_per_post, post_offsets):
+        return array.array("d", (self.later(post_offset) for post_offset, count in zip(post_offsets, comments_per_post)
+                                 for _ in range(count)))
+
+    def user_lines(self):
+        password_hash = hash_password(self.password)
+        for user_id in range(1, self.users + 1):
+            first_name = self.rng.choice(FIRST_NAMES)
+            last_name = self.rng.choice(LAST_NAMES)
+            created_at = self.timestamp(self.offset(user_id, self.users))
+            yield f"{user_id}\tuser{user_id}\t{first_name}\t{last_name}\tuser{user_id}@example.com\t{password_hash}\t{created_at}\n"
+
+    def post_lines(self, like_counts, offsets):
+        for post_id in range(1, self.posts + 1):
+            created_at = self.timestamp(offsets[post_id - 1])
+            yield (f"{post_id}\t{self.rng.randint(1, self.users)}\t{sentence(self.rng, 6).capitalize()}\t{sentence(self.rng, 60)}\t"
+                   f"{like_counts[post_id - 1]}\t{created_at}\t{created_at}\n")
+
+    def comment_lines(self, comments_per_post, like_counts, offsets):
+        comment_id = 0
+        for post_id, count in enumerate(comments_per_post, start=1):
+            for _ in range(count):
+                comment_id += 1
+                created_at = self.timestamp(offsets[comment_id - 1])
+                yield (f"{comment_id}\t{self.rng.randint(1, self.users)}\t{post_id}\t{sentence(self.rng, 12)}\t"
+                       f"{like_counts[comment_id - 1]}\t{created_at}\t{created_at}\n")
+
+    def like_lines(self, like_counts, parent_offsets):
+        # Distinct users per parent, so the unique (user, parent) constraint always holds.
+        for parent_id, count in enumerate(like_counts, start=1):
+            for user_id in self.rng.sample(range(1, self.users + 1), count):
+                yield f"{user_id}\t{parent_id}\t{self.timestamp(self.later(parent_offsets[parent_id - 1]))}\n"
+
+    def generate(self, connection, batch_size: int = 100000, log=None):
+        """
+        Empties the database, trending scores included, then loads the dataset table by table, one transaction each.
+
+        :param connection: A SQLAlchemy connection on the psycopg2 driver.
+        :return: How many rows were loaded into each table.
+        """
+        post_like_counts = zipf_counts(self.post_likes, self.posts, self.zipf_exponent, self.users, self.rng)
+        comments_per_post = zipf_counts(self.comments, self.posts, self.zipf_exponent, self.comments, self.rng)
+        comment_like_counts = zipf_counts(self.comment_likes, self.comments, self.zipf_exponent, self.users, self.rng)
+        post_offsets = self.post_offsets()
+        comment_offsets = self.comment_offsets(comments_per_post, post_offsets)
+
+        with connection.begin():
+            connection.execute(text("TRUNCATE users, post_trending, trending_refreshes RESTART IDENTITY CASCADE"))
+
+        loaded = {}
+        for name, columns, lines in [
+            ("users", ["user_id", "username", "first_name", "last_name", "email", "password", "created_at"], self.user_lines()),
+            ("posts", ["post_id", "user_id", "title", "content", "like_count", "created_at", "updated_at"], self.post_lines(post_like_counts, post_offsets)),
+            ("comments", ["comment_id", "user_id", "blog_post_id", "content", "like_count", "created_at", "updated_at"], self.comment_lines(comments_per_post, comment_like_counts, comment_offsets)),
+            ("post_likes", ["user_id", "blog_post_id", "created_at"], self.like_lines(post_like_counts, post_offsets)),
+            ("comment_likes", ["user_id", "comment_id", "created_at"], self.like_lines(comment_like_counts, comment_offsets)),
+        ]:
+            entity = ENTITIES[name]
+            started = time.perf_counter()
+            rows = 0
+            with connection.begin(), connection.connection.dbapi_connection.cursor() as cursor:
+                # A crash loses the table being loaded anyway, so don't wait on every WAL flush.
+                cursor.execute("SET LOCAL synchronous_commit = off")
+                for batch in batches(lines, batch_size):
+                    cursor.copy_expert(f"COPY {entity.table} ({', '.join(columns)}) FROM STDIN", io.StringIO("".join(batch)))
+                    rows += len(batch)
+                    if log:
+                        log(f"{name}: {rows} rows, {rows / (time.perf_counter() - started):.0f} rows/s")
+            loaded[name] = rows
+
+        with connection.begin():
+            for entity in ENTITIES.values():
+                reset_sequence(connection, entity)
+        with connection.begin():
+            connection.execute(text("ANALYZE"))
+        return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replace the database contents with a synthetic dataset.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=300000)
+    parser.add_argument("--post-likes", type=int, default=1000000)
+    parser.add_argument("--comment-likes", type=int, default=300000)
+    parser.add_argument("--zipf-exponent", type=float, default=1.0, help="Higher makes the hottest posts hotter")
+    parser.add_argument("--password", default="password123", help="Password of every generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--database", help="The configured database, named to confirm it may be emptied")
+    parser.add_argument("--yes", action="store_true", help="Empty the configured database without naming it")
+    args = parser.parse_args(argv)
+
+    from app.config import settings
+    if not args.yes and args.database != settings.database_name:
+        parser.error(f"This empties {settings.database_name}; pass --database {settings.database_name} or --yes to go ahead")
+
+    from app.database import engine
+
+    generator = DatasetGenerator(args.users, args.posts, args.comments, args.post_likes, args.comment_likes,
+                                 args.zipf_exponent, args.password, args.seed)
+    with engine.connect() as connection:
+        loaded = generator.generate(connection, args.batch_size, log=lambda message: print(message, file=sys.stderr))
+    print(loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Checks that every query shape the API runs finds its rows through an index.
+
+Each shape is built from the same helpers the routers use, filled with ids from the
+database, and EXPLAINed. By default sequential scans are disabled for the check
+(`enable_seqscan = off`): a plan that still scans a table sequentially, or walks a whole
+index filtering every row, has no index matching its condition, whatever the size of the
+data. With `--natural` the planner's own choice on the current data is shown instead,
+which is only meaningful on a seeded database (see `app.commands.generate_dataset`).
+
+Usage:
+    python -m app.commands.index_advisor
+    python -m app.commands.index_advisor --natural --verbose
+
+Exits with status 1 when a shape lacks an index, so it can run in CI.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, literal
+from app import models
+from app.pagination import paginate, encode_cursor
+from app.routers.post import select_posts, select_post_versions, filter_search, rank_search
+from app.routers.comment import select_comments, select_comment_versions
+from app.routers.like import add_like, remove_like, select_liked, select_likers
+from app.routers.user import select_users, export_queries
+from app.services.like_counter_service import post_likes, comment_likes
+from app.services.trending_service import trending_scorer, trending_feed
+
+
+class Sample:
+    """
+    Ids of existing rows to fill the query shapes with, preferring the busiest ones.
+    """
+
+    def __init__(self, connection):
+        self.post = connection.execute(select(models.BlogPost.post_id, models.BlogPost.created_at).order_by(models.BlogPost.stored_like_count.desc()).limit(1)).first()
+        self.post_id = self.post.post_id if self.post else 1
+        self.comment_id = connection.scalar(select(models.Comment.comment_id).order_by(models.Comment.stored_like_count.desc()).limit(1)) or 1
+        self.user_id = connection.scalar(select(models.BlogPost.user_id).group_by(models.BlogPost.user_id).order_by(func.count().desc()).limit(1)) or 1
+
+    @property
+    def post_cursor(self):
+        return encode_cursor(self.post.created_at, self.post.post_id) if self.post else None
+
+
+def query_shapes(sample: Sample) -> dict:
+    """
+    The statements behind the API's endpoints and cascades, by name.
+    """
+    post_id, comment_id, user_id = sample.post_id, sample.comment_id, sample.user_id
+    post_page = lambda query, cursor=None: paginate(query, models.BlogPost.created_at, models.BlogPost.post_id, 10, 0, cursor)
+    comment_page = lambda query: paginate(query.filter(models.Comment.blog_post_id == post_id), models.Comment.created_at, models.Comment.comment_id, 10)
+    liked = add_like(models.PostsLike.blog_post_id, models.BlogPost.post_id, "uq_posts_likes_user_post", user_id, post_id)
+    unliked = remove_like(models.CommentsLike.comment_id, user_id, comment_id)
+    export_posts, export_comments, export_post_likes, export_comment_likes = (query for query, _ in export_queries(user_id))
+
+    shapes = {
+        "GET /posts/": post_page(select_posts()),
+        "GET /posts/ cursor": post_page(select_posts(), sample.post_cursor),
+        "GET /posts/ versions": post_page(select_post_versions()),
+        "GET /posts/?search=": post_page(filter_search(select_posts(), "lorem")),
+        "GET /posts/search": rank_search(select_posts(), "lorem").limit(10),
+        "GET /posts/{id}": select_posts().filter(models.BlogPost.post_id == post_id),
+        "GET /comments/posts/{post_id}": comment_page(select_comments()),
+        "GET /comments/posts/{post_id} versions": comment_page(select_comment_versions()),
+        "GET /comments/{id}": select_comments().filter(models.Comment.comment_id == comment_id),
+        "POST /likes/posts/{post_id}": post_likes.change(liked, 1),
+        "DELETE /likes/comments/{comment_id}": comment_likes.change(unliked, -1),
+        "GET /likes/posts": select_liked(models.PostsLike.blog_post_id, user_id, [post_id, post_id + 1]),
+        "GET /likes/comments": select_liked(models.CommentsLike.comment_id, user_id, [comment_id, comment_id + 1]),
+        "GET /likes/posts/{post_id}/users": paginate(select_likers(models.PostsLike.blog_post_id, post_id), models.PostsLike.created_at, models.PostsLike.id, 10),
+        "GET /likes/comments/{comment_id}/users": paginate(select_likers(models.CommentsLike.comment_id, comment_id), models.CommentsLike.created_at, models.CommentsLike.id, 10),
+        "GET /users/": paginate(select_users(), models.User.created_at, models.User.user_id, 100),
+        "GET /users/?search=": paginate(select_users("user1"), models.User.created_at, models.User.user_id, 100),
+        "GET /users/me/export posts": export_posts,
+        "GET /users/me/export comments": export_comments,
+        "GET /users/me/export post likes": export_post_likes,
+        "GET /users/me/export comment likes": export_comment_likes,
+        "trending refresh": trending_scorer.event_scores(datetime.now() - timedelta(minutes=1), datetime.now()),
+        "GET /posts/trending reload": trending_feed.query(),
+    }
+    # ON DELETE CASCADE looks up the referencing rows of every deleted parent like this.
+    for model, column, parent_id in [
+        (models.BlogPost, models.BlogPost.user_id, user_id),
+        (models.Comment, models.Comment.user_id, user_id),
+        (models.Comment, models.Comment.blog_post_id, post_id),
+        (models.PostsLike, models.PostsLike.user_id, user_id),
+        (models.PostsLike, models.PostsLike.blog_post_id, post_id),
+        (models.CommentsLike, models.CommentsLike.user_id, user_id),
+        (models.CommentsLike, models.CommentsLike.comment_id, comment_id),
+        (models.PostLikeShard, models.PostLikeShard.blog_post_id, post_id),
+        (models.CommentLikeShard, models.CommentLikeShard.comment_id, comment_id),
+        (models.PostTrending, models.PostTrending.blog_post_id, post_id),
+    ]:
+        shapes[f"cascade {model.__tablename__}.{column.key}"] = select(literal(1)).select_from(model).filter(column == parent_id)
+    return shapes
+
+
+def unindexed_scans(plan: dict, limited: bool = False) -> list:
+    """
+    The tables a plan (EXPLAIN FORMAT JSON node) reads without an index condition:
+    sequential scans, and whole index scans filtering every row they read. The latter
+    are fine under a LIMIT, where walking the index in sort order stops early.
+    """
+    scans = []
+    if plan["Node Type"] == "Seq Scan":
+        scans.append(plan["Relation Name"])
+    elif plan["Node Type"] in ("Index Scan", "Index Only Scan") and "Index Cond" not in plan and "Filter" in plan and not limited:
+        scans.append(f"{plan['Relation Name']} (whole {plan['Index Name']})")
+    for child in plan.get("Plans", []):
+        scans += unindexed_scans(child, limited or plan["Node Type"] == "Limit")
+    return scans
+
+
+def node_types(plan: dict) -> list:
+    types = [plan["Node Type"] + (f" on {plan['Relation Name']}" if "Relation Name" in plan else "") + (f" using {plan['Index Name']}" if "Index Name" in plan else "")]
+    for child in plan.get("Plans", []):
+        types += node_types(child)
+    return types
+
+
+def explain(connection, statement) -> dict:
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    return connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()[0]["Plan"]
+
+
+def advise(connection, natural: bool = False, extra_shapes: dict = None) -> dict:
+    """
+    EXPLAINs every query shape and returns the tables each one reads without an index condition.
+
+    :param natural: Keep sequential scans enabled, reporting the planner's choice on the current data.
+    :return: `{shape name: (tables read without an index condition, plan)}`.
+    """
+    with connection.begin() as transaction:
+        shapes = query_shapes(Sample(connection))
+        shapes.update(extra_shapes or {})
+        if not natural:
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        report = {}
+        for name, statement in shapes.items():
+            plan = explain(connection, statement)
+            report[name] = (unindexed_scans(plan), plan)
+        # EXPLAIN runs nothing, but the like shapes are writes: leave no trace either way.
+        transaction.rollback()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag API query shapes that read a table without an index.")
+    parser.add_argument("--natural", action="store_true", help="Show the planner's own choice on the current data")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan's nodes")
+    parser.add_argument("--json", action="store_true", help="Print the plans as JSON")
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+
+    with engine.connect() as connection:
+        report = advise(connection, args.natural)
+
+    if args.json:
+        print(json.dumps({name: {"unindexed_scans": scans, "plan": plan} for name, (scans, plan) in report.items()}, indent=2))
+    else:
+        for name, (scans, plan) in report.items():
+            status = f"NO INDEX for {', '.join(scans)}" if scans else "ok"
+            print(f"{name:<45} {status}")
+            if args.verbose:
+                for node in node_types(plan):
+                    print(f"    {node}")
+    flagged = [name for name, (scans, _) in report.items() if scans]
+    if flagged:
+        print(f"\n{len(flagged)} query shape(s) read a table without an index condition; add an index for them.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
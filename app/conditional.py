@@ -0,0 +1,47 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from fastapi import Request, Response, status
+
+def make_etag(data: bytes) -> str:
+    """
+    A strong ETag for a response whose representation is fully determined by `data`.
+    """
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+def versions_etag(versions) -> str:
+    """
+    A strong ETag for a list response, made from the version columns of its rows
+    (id, updated_at, like_count, author...) instead of the serialized rows.
+    """
+    return make_etag(repr([tuple(version) for version in versions]).encode())
+
+def http_date(moment: datetime) -> str:
+    # Timestamps are stored without a zone and are UTC.
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Whether the client's cached copy, named by `If-None-Match`, is still current.
+
+    `If-Modified-Since` is not honoured: a like on a sharded counter or an author's new
+    name changes the response without touching `updated_at`, so only the ETag is trusted.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
@@ -1,3 +1,4 @@
+from typing import Optional, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -11,6 +12,43 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
     root_pass: str
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: float = 10
+    jwt_claims_mode: bool = False
+    jwt_claims_expire_minutes: int = 5
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 64
+    like_counter_shards: int = 0
+    like_counter_compact_interval_seconds: float = 60
+    response_cache_size: int = 10000
+    response_cache_l1_ttl_seconds: float = 5
+    response_cache_ttl_seconds: float = 60
+    response_cache_url: Optional[str] = None
+    database_replica_urls: str = ""
+    database_replica_strategy: Literal["round_robin", "least_connections"] = "round_robin"
+    database_replica_retry_seconds: float = 30
+    read_your_writes_seconds: float = 5
+    metrics_enabled: bool = True
+    sql_profiling_sample_rate: float = 0
+    slow_query_seconds: float = 0.5
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    compression_offload_min_bytes: int = 65536
+    trending_refresh_interval_seconds: float = 60
+    trending_max_staleness_seconds: float = 120
+    trending_half_life_hours: float = 6
+    trending_like_weight: float = 1
+    trending_comment_weight: float = 3
+    trending_min_score: float = 0.01
+    trending_size: int = 100
     
     model_config = SettingsConfigDict(env_file=".env")
     
@@ -1,19 +1,77 @@
+import logging
+from contextlib import asynccontextmanager
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from .config import settings
+from .services.pool_service import TimedQueuePool, TimedAsyncAdaptedQueuePool, pool_options
+from .services.replica_service import create_replica_router
+
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+SQLALCHEMY_ASYNC_DATABASE_URL = f'postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Blocking engine, kept for scripts and command line tools.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, **pool_options(settings))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine used by the API, so a request waiting on Postgres does not hold a worker thread.
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=TimedAsyncAdaptedQueuePool, **pool_options(settings))
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replicas behind `get_read_db`, empty unless `database_replica_urls` is set.
+replica_router = create_replica_router(settings)
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+async def get_db(request: Request):
+    # A client that writes reads from the primary for a while, see ReplicaRouter.
+    writes = request.method not in READ_METHODS
+    if writes:
+        replica_router.record_write(request.headers.get("authorization"))
+    async with AsyncSessionLocal() as db:
+        yield db
+    if writes:
+        replica_router.record_write(request.headers.get("authorization"))
+
+async def open_read_session(client_key: str = None):
+    replica = replica_router.choose(client_key)
+    if replica is not None:
+        db = replica.session_factory()
+        try:
+            # Connect now, so an unreachable replica falls back before the endpoint runs.
+            await db.connection()
+            db.info["replica"] = True
+            return db
+        except Exception:
+            logger.exception("Connecting to a read replica failed")
+            await db.close()
+            replica_router.mark_unhealthy(replica)
+    return AsyncSessionLocal()
+
+async def get_read_db(request: Request):
+    """
+    A session for endpoints that only read. It is on a replica when replicas are configured
+    and the client hasn't written recently, else on the primary.
+    """
+    async with await open_read_session(request.headers.get("authorization")) as db:
+        yield db
+
+@asynccontextmanager
+async def primary_session(db):
+    """
+    `db` itself when it is on the primary, else a new session on the primary. Reads that fill
+    the shared response cache use it: a lagging replica would cache a stale body for everyone.
+    """
+    if not db.info.get("replica"):
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+        return
+    async with AsyncSessionLocal() as primary:
+        yield primary
@@ -1,11 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import user, auth, post, comment, like
+from app.config import settings
+from app.database import AsyncSessionLocal, replica_router
+from app.routers import user, auth, post, comment, like, admin, metrics
+from app.services.password_service import password_hasher
+from app.services.like_counter_service import compact_periodically
+from app.services.response_cache_service import response_cache
+from app.services.metrics_service import MetricsMiddleware, request_metrics
+from app.services.profiling_service import ProfilingMiddleware, sql_profiler
+from app.services.compression_service import CompressionMiddleware, compressor
+from app.services.trending_service import refresh_periodically
 
-blogApp = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = []
+    if settings.like_counter_shards > 0:
+        background_tasks.append(asyncio.create_task(compact_periodically(AsyncSessionLocal, settings.like_counter_compact_interval_seconds)))
+    if settings.trending_refresh_interval_seconds > 0:
+        background_tasks.append(asyncio.create_task(refresh_periodically(AsyncSessionLocal, settings.trending_refresh_interval_seconds)))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    password_hasher.shutdown()
+    await response_cache.close()
+    await replica_router.dispose()
+
+blogApp = FastAPI(lifespan=lifespan)
 
 
 blogApp.include_router(user.router)
 blogApp.include_router(auth.router)
 blogApp.include_router(post.router)
 blogApp.include_router(comment.router)
-blogApp.include_router(like.router)
\ No newline at end of file
+blogApp.include_router(like.router)
+blogApp.include_router(admin.router)
+
+# Added first so it runs innermost: request latencies include compression time.
+if settings.compression_enabled:
+    blogApp.add_middleware(CompressionMiddleware, compressor=compressor)
+
+if settings.metrics_enabled:
+    blogApp.add_middleware(MetricsMiddleware, metrics=request_metrics)
+    blogApp.include_router(metrics.router)
+
+# Passes requests straight through unless sql_profiling_sample_rate is set.
+blogApp.add_middleware(ProfilingMiddleware, profiler=sql_profiler)
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Date, func, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Date, Float, func, UniqueConstraint, Boolean, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql.expression import text
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred, query_expression, with_expression
+from sqlalchemy import select
+from .config import settings
 from .database import Base
 
 class User(Base):
@@ -17,6 +20,13 @@ class User(Base):
     birthdate = Column(Date, nullable=True)
     admin = Column(Boolean, nullable=False, server_default='False')
 
+    # Admin listing: keyset pagination sort key and case-insensitive prefix search
+    __table_args__ = (
+        Index('ix_users_created_at_user_id', 'created_at', 'user_id'),
+        Index('ix_users_username_lower', func.lower(username).label('username_lower'), postgresql_ops={'username_lower': 'text_pattern_ops'}),
+        Index('ix_users_email_lower', func.lower(email).label('email_lower'), postgresql_ops={'email_lower': 'text_pattern_ops'}),
+    )
+
     # Relationships
     blog_posts = relationship('BlogPost', back_populates='author', cascade='all, delete-orphan')
     comments = relationship('Comment', back_populates='author', cascade='all, delete-orphan')
@@ -33,10 +43,25 @@ class BlogPost(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    like_count = Column(Integer, server_default=text("0"))
+    # Likes folded into the row. Read `like_count` (see `total_like_count`) for the total including unfolded shards.
+    stored_like_count = Column('like_count', Integer, server_default=text("0"))
+    # Maintained by Postgres from the title and content, never loaded unless asked for.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B')",
+        persisted=True
+    )))
+
+    # Keyset pagination sort key, full-text search, and a user's posts (export, cascade on user delete)
+    __table_args__ = (
+        Index('ix_blog_posts_created_at_post_id', 'created_at', 'post_id'),
+        Index('ix_blog_posts_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_blog_posts_user_id_post_id', 'user_id', 'post_id'),
+    )
 
     # Relationships
-    author = relationship('User', back_populates='blog_posts')
+    # Listings serialize the author of every row, so it must be eager loaded (see `select_posts`)
+    # rather than silently costing one query per row.
+    author = relationship('User', back_populates='blog_posts', lazy='raise_on_sql')
     comments = relationship('Comment', back_populates='blog_post', cascade='all, delete-orphan')
     likes = relationship('PostsLike', back_populates='blog_post', cascade='all, delete-orphan')
 
@@ -50,10 +75,19 @@ class Comment(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    like_count = Column(Integer, server_default=text("0"))
+    # Likes folded into the row. Read `like_count` (see `total_like_count`) for the total including unfolded shards.
+    stored_like_count = Column('like_count', Integer, server_default=text("0"))
+
+    # Keyset pagination sort key within a post, a user's comments (export, cascade on user delete),
+    # and the comments since the last trending refresh
+    __table_args__ = (
+        Index('ix_comments_blog_post_id_created_at_comment_id', 'blog_post_id', 'created_at', 'comment_id'),
+        Index('ix_comments_user_id_comment_id', 'user_id', 'comment_id'),
+        Index('ix_comments_created_at', 'created_at'),
+    )
 
     # Relationships
-    author = relationship('User', back_populates='comments')
+    author = relationship('User', back_populates='comments', lazy='raise_on_sql')
     blog_post = relationship('BlogPost', back_populates='comments')
     likes = relationship('CommentsLike', back_populates='comment', cascade='all, delete-orphan')
 
@@ -66,9 +100,11 @@ class PostsLike(Base):
     blog_post_id = Column(Integer, ForeignKey('blog_posts.post_id', ondelete='CASCADE'), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
-    # Unique constraint
+    # Unique constraint, keyset pagination sort key, and the likes since the last trending refresh
     __table_args__ = (
         UniqueConstraint('user_id', 'blog_post_id', name='uq_posts_likes_user_post'),
+        Index('ix_posts_likes_blog_post_id_created_at_id', 'blog_post_id', 'created_at', 'id'),
+        Index('ix_posts_likes_created_at', 'created_at'),
     )
 
     # Relationships
@@ -84,11 +120,78 @@ class CommentsLike(Base):
     comment_id = Column(Integer, ForeignKey('comments.comment_id', ondelete='CASCADE'), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
-    # Unique constraint
+    # Unique constraint and keyset pagination sort key
     __table_args__ = (
         UniqueConstraint('user_id', 'comment_id', name='uq_comments_likes_user_comment'),
+        Index('ix_comments_likes_comment_id_created_at_id', 'comment_id', 'created_at', 'id'),
     )
 
     # Relationships
     user = relationship('User', back_populates='comment_likes')
     comment = relationship('Comment', back_populates='likes')
+
+
+class PostLikeShard(Base):
+    __tablename__ = 'post_like_shards'
+
+    # Likes of a hot post are spread over several rows, so they don't all wait on one row lock.
+    blog_post_id = Column(Integer, ForeignKey('blog_posts.post_id', ondelete='CASCADE'), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    delta = Column(Integer, nullable=False, server_default=text("0"))
+
+
+class CommentLikeShard(Base):
+    __tablename__ = 'comment_like_shards'
+
+    comment_id = Column(Integer, ForeignKey('comments.comment_id', ondelete='CASCADE'), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    delta = Column(Integer, nullable=False, server_default=text("0"))
+
+
+class PostTrending(Base):
+    __tablename__ = 'post_trending'
+
+    # Time decayed score of a post's recent likes and comments, kept up to date by the trending refresh.
+    blog_post_id = Column(Integer, ForeignKey('blog_posts.post_id', ondelete='CASCADE'), primary_key=True)
+    score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index('ix_post_trending_score', 'score'),
+    )
+
+
+class TrendingRefresh(Base):
+    __tablename__ = 'trending_refreshes'
+
+    # A single row: the time up to which likes and comments are counted into `post_trending`.
+    id = Column(Integer, primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+# Total likes, as loaded by `with_like_count`; the folded count when loaded without it.
+BlogPost.like_count = query_expression(BlogPost.stored_like_count)
+Comment.like_count = query_expression(Comment.stored_like_count)
+
+
+def total_like_count(model):
+    """
+    The total likes of `BlogPost` or `Comment` rows: the folded count, plus whatever is still
+    waiting in the shards while `like_counter_shards` is set. Without sharding the shards
+    are left unread, which spares every load the correlated sum.
+    """
+    if settings.like_counter_shards <= 0:
+        return model.stored_like_count
+    if model is BlogPost:
+        shard_model, shard_parent_id = PostLikeShard, PostLikeShard.blog_post_id == BlogPost.post_id
+    else:
+        shard_model, shard_parent_id = CommentLikeShard, CommentLikeShard.comment_id == Comment.comment_id
+    return model.stored_like_count + (
+        select(func.coalesce(func.sum(shard_model.delta), 0))
+        .where(shard_parent_id)
+        .correlate_except(shard_model)
+        .scalar_subquery()
+    )
+
+def with_like_count(model):
+    # Loader option filling `like_count` with `total_like_count`, for rows that are serialized.
+    return with_expression(model.like_count, total_like_count(model))
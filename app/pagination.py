@@ -0,0 +1,54 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque `next_cursor` token.
+    """
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """
+    Decodes a token made by `encode_cursor` back into its `(created_at, id)` sort key.
+
+    :raises ValueError: If the token was not produced by `encode_cursor`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid cursor {cursor!r}") from error
+
+def paginate(query, created_at_column, id_column, limit: int, skip: int = 0, cursor: str = None):
+    """
+    Orders `query` by `(created_at, id)` and returns the requested page of it.
+
+    With a `cursor` the page starts right after the row the cursor was made from, which
+    an index on the sort key answers without reading the skipped rows. Without one it
+    falls back to `skip`.
+    """
+    query = query.order_by(created_at_column, id_column).limit(limit)
+    if cursor is None:
+        return query.offset(skip)
+    try:
+        created_at, id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    return query.filter(tuple_(created_at_column, id_column) > tuple_(created_at, id))
+
+def set_next_cursor(response: Response, page, limit: int, id_attribute: str):
+    """
+    Sends the cursor of the page after `page` in the `X-Next-Cursor` header, unless `page` was the last one.
+
+    :param page: The rows of this page, each with a `created_at` and an `id_attribute` attribute.
+    """
+    if page and len(page) == limit:
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, getattr(last, id_attribute))
@@ -0,0 +1,67 @@
+from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas
+from app.database import async_engine, replica_router, get_db
+from app.services import oauth2_service
+from app.services.pool_service import pool_status
+from app.services.password_service import password_hasher
+from app.services.like_counter_service import compact_like_counters
+from app.services.response_cache_service import response_cache
+from app.services.trending_service import refresh_trending, trending_scorer, trending_feed
+
+router = APIRouter(
+    prefix= "/admin",
+    tags=["Admin"]
+)
+
+@router.get("/pool", response_model=schemas.PoolStatus)
+async def get_pool_status(current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to view the connection pool")
+
+    return pool_status(async_engine.pool)
+
+
+@router.get("/replicas", response_model=List[schemas.ReplicaStatus])
+async def get_replica_status(current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to view the read replicas")
+
+    return replica_router.status()
+
+
+@router.get("/password-hashing", response_model=schemas.PasswordHashingStatus)
+async def get_password_hashing_status(current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to view password hashing metrics")
+
+    return password_hasher.stats()
+
+
+@router.get("/response-cache", response_model=schemas.ResponseCacheStatus)
+async def get_response_cache_status(current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to view response cache metrics")
+
+    return response_cache.stats()
+
+
+@router.post("/like-counters/compact", response_model=schemas.LikeCounterCompaction)
+async def compact_likes(db: AsyncSession = Depends(get_db), current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to compact like counters")
+
+    return await compact_like_counters(db)
+
+
+@router.post("/trending/refresh", response_model=schemas.TrendingRefreshResult)
+async def refresh_trending_posts(db: AsyncSession = Depends(get_db), current_user = Depends(oauth2_service.get_current_principal)):
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to refresh trending posts")
+
+    ranked = await refresh_trending(db, trending_scorer)
+    if ranked is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Trending posts are being refreshed already")
+    await trending_feed.load(db)
+    return {"ranked_posts": ranked}
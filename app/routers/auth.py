@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from app.services import oauth2_service
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas import Token
 from app.models import User
-from app.utils import verify_password
+from app.services.password_service import password_hasher
 
 router = APIRouter(
     prefix= "/login",
@@ -13,13 +14,13 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=Token)
-def login(userCredentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == userCredentials.username).first()
+async def login(userCredentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).filter(User.username == userCredentials.username))
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
-    if not verify_password(userCredentials.password, user.password):
+    if not await password_hasher.verify(userCredentials.password, user.password):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
     
-    access_token = oauth2_service.create_jwt_token(data={"user_id": user.user_id})
+    access_token = oauth2_service.create_user_token(user)
     
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,18 +1,37 @@
-from fastapi import HTTPException, status, Depends, APIRouter, Response
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, status, Depends, APIRouter, Request, Response
+from typing import List, Optional
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app import models, schemas
 from app.services import oauth2_service
-from ..database import get_db
+from app.services.response_cache_service import response_cache, comment_key, pack_entry, unpack_entry
+from ..database import get_db, get_read_db, primary_session
+from ..pagination import paginate, set_next_cursor
+from ..conditional import make_etag, versions_etag, is_not_modified, validator_headers, not_modified
+from ..serializers import serialize_comment, dump_json, json_list_response
 
 router = APIRouter(
     prefix = "/comments",
     tags=["Comments"]
 )
 
+def select_comments():
+    # The author is serialized with every comment and async sessions cannot lazy load it.
+    return select(models.Comment).options(joinedload(models.Comment.author), models.with_like_count(models.Comment))
+
+def select_comment_versions():
+    # Everything a CommentReturn shows that can change, without the content.
+    return select(models.Comment.comment_id, models.Comment.updated_at, models.total_like_count(models.Comment).label("like_count"),
+                  models.User.username, models.User.first_name, models.User.last_name).join(models.Comment.author)
+
+def comment_version(comment: models.Comment):
+    return (comment.comment_id, comment.updated_at, comment.like_count, comment.author.username, comment.author.first_name, comment.author.last_name)
+
 @router.post("/posts/{post_id}", status_code=status.HTTP_201_CREATED, response_model=schemas.CommentReturn)
-def create_comment(comment: schemas.CommentCreate, post_id: int, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == post_id).first()
+async def create_comment(comment: schemas.CommentCreate, post_id: int, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
+    post = await db.scalar(select(models.BlogPost).filter(models.BlogPost.post_id == post_id))
     if not post:
          raise HTTPException(
              status_code=status.HTTP_404_NOT_FOUND,
@@ -20,56 +39,81 @@ def create_comment(comment: schemas.CommentCreate, post_id: int, db: Session = D
          )
     new_comment = models.Comment(content=comment.content, user_id=current_user.user_id, blog_post_id=post_id)
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
-    return new_comment
+    try:
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        oauth2_service.raise_for_deleted_user(error)
+        # The post was deleted since it was looked up.
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Blog post with ID {post_id} was not found.") from error
+    return await db.scalar(select_comments().filter(models.Comment.comment_id == new_comment.comment_id).execution_options(populate_existing=True))
 
 @router.get("/posts/{post_id}", response_model=List[schemas.CommentReturn])
-def get_comments_of_post(post_id: int, db: Session = Depends(get_db), limit: int = 10, skip: int = 0):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == post_id).first()
+async def get_comments_of_post(post_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db), limit: int = 10, skip: int = 0, cursor: Optional[str] = None):
+    post = await db.scalar(select(models.BlogPost).filter(models.BlogPost.post_id == post_id))
     if not post:
          raise HTTPException(
              status_code=status.HTTP_404_NOT_FOUND,
              detail=f"Blog post with ID {post_id} was not found."
          )
-    comments = db.query(models.Comment).filter(models.Comment.blog_post_id == post_id)
-    comments = comments.limit(limit).offset(skip).all()
-    return comments
+    def page(query):
+        return paginate(query.filter(models.Comment.blog_post_id == post_id), models.Comment.created_at, models.Comment.comment_id, limit, skip, cursor)
+
+    if "if-none-match" in request.headers:
+        versions = (await db.execute(page(select_comment_versions()))).all()
+        etag = versions_etag(versions)
+        if is_not_modified(request, etag):
+            return not_modified(etag, max((version.updated_at for version in versions), default=None))
+
+    comments = (await db.scalars(page(select_comments()))).all()
+    set_next_cursor(response, comments, limit, "comment_id")
+    response.headers.update(validator_headers(versions_etag(map(comment_version, comments)), max((comment.updated_at for comment in comments), default=None)))
+    return json_list_response(serialize_comment, comments, response)
 
 @router.get("/{id}", response_model=schemas.CommentReturn)
-def get_comment(id: int, db: Session = Depends(get_db)):
-    comment = db.query(models.Comment).filter(models.Comment.comment_id == id).first()
-    if not comment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Comment with ID {id} was not found."
-        )
-    return comment
+async def get_comment(id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    entry = await response_cache.get(comment_key(id))
+    if entry is None:
+        async with response_cache.filling(comment_key(id)) as fill:
+            async with primary_session(db) as source:
+                comment = await source.scalar(select_comments().filter(models.Comment.comment_id == id))
+            if not comment:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Comment with ID {id} was not found."
+                )
+            entry = pack_entry(dump_json(serialize_comment, comment), comment.updated_at)
+            await fill(entry)
+    body, last_modified = unpack_entry(entry)
+    etag = make_etag(body)
+    if is_not_modified(request, etag):
+        return not_modified(etag, last_modified)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag, last_modified))
 
 @router.put("/{id}", response_model=schemas.CommentReturn)
-def update_comment(id: int, updated_comment: schemas.CommentCreate, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
-    comment_query = db.query(models.Comment).filter(models.Comment.comment_id == id)
-    comment = comment_query.first()
+async def update_comment(id: int, updated_comment: schemas.CommentCreate, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
+    comment = await db.scalar(select(models.Comment).filter(models.Comment.comment_id == id))
 
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Comment with ID {id} was not found")
     if comment.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Comment with ID {id} doesn't belong to the current user.")
 
-    comment_query.update(updated_comment.model_dump(), synchronize_session=False)
-    db.commit()
-    return comment_query.first()
+    await db.execute(update(models.Comment).filter(models.Comment.comment_id == id).values(**updated_comment.model_dump()).execution_options(synchronize_session=False))
+    await db.commit()
+    await response_cache.invalidate(comment_key(id))
+    return await db.scalar(select_comments().filter(models.Comment.comment_id == id).execution_options(populate_existing=True))
 
 @router.delete("/{id}")
-def delete_comment(id: int, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
-    comment_query = db.query(models.Comment).filter(models.Comment.comment_id == id)
-    comment = comment_query.first()
+async def delete_comment(id: int, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
+    comment = await db.scalar(select(models.Comment).filter(models.Comment.comment_id == id))
 
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Comment with ID {id} was not found")
     if comment.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Comment with ID {id} doesn't belong to the current user.")
 
-    comment_query.delete()
-    db.commit()
+    await db.execute(delete(models.Comment).filter(models.Comment.comment_id == id).execution_options(synchronize_session=False))
+    await db.commit()
+    await response_cache.invalidate(comment_key(id))
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,170 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from sqlalchemy import select, delete, literal, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import oauth2_service
-from ..database import get_db
+from app.services.like_counter_service import post_likes, comment_likes
+from app.services.response_cache_service import response_cache, post_key, comment_key
+from ..database import get_db, get_read_db
 from app import models, schemas
-from typing import List
+from typing import List, Optional
+from ..pagination import paginate, set_next_cursor
+from ..serializers import serialize_user_public, json_list_response
 
 router = APIRouter(
     prefix="/likes",
     tags=["Likes"]
 )
 
-@router.post("/posts/{post_id}", status_code=status.HTTP_201_CREATED, response_model=schemas.PostLikeResponse)
-def like_post(post_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2_service.get_current_user)):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == post_id).first()
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Post with ID {post_id} does not exist."
-        )
+MAX_LOOKUP_IDS = 500
+
+async def exists(db: AsyncSession, id_column, id: int):
+    return await db.scalar(select(id_column).filter(id_column == id)) is not None
+
+def add_like(like_column, parent_column, constraint: str, user_id: int, parent_id: int):
+    """
+    CTE inserting the user's like of an existing parent, returning its id unless it was liked already.
+
+    :param like_column: The like table's column referencing the parent, e.g. PostsLike.blog_post_id.
+    :param parent_column: The parent's primary key, e.g. BlogPost.post_id.
+    """
+    return insert(like_column.class_).from_select(
+        ["user_id", like_column.key],
+        select(literal(user_id, Integer), parent_column).filter(parent_column == parent_id)
+    ).on_conflict_do_nothing(constraint=constraint).returning(like_column.label("parent_id")).cte("liked")
+
+def remove_like(like_column, user_id: int, parent_id: int):
+    # CTE deleting the user's like of the parent, returning its id if there was one.
+    like_model = like_column.class_
+    return delete(like_model).filter(
+        like_column == parent_id,
+        like_model.user_id == user_id
+    ).returning(like_column.label("parent_id")).cte("unliked")
+
+def select_liked(like_column, user_id: int, ids: List[int]):
+    # Answered from the (user_id, parent) unique index.
+    return select(like_column).filter(like_column.class_.user_id == user_id, like_column.in_(ids))
 
-    existing_like = db.query(models.PostsLike).filter(
-        models.PostsLike.blog_post_id == post_id,
-        models.PostsLike.user_id == current_user.user_id
-    ).first()
+def select_likers(like_column, parent_id: int):
+    # Users who liked the parent, with the like's created_at and id to paginate on.
+    like_model = like_column.class_
+    return select(models.User, like_model.created_at, like_model.id).join(
+        like_model, like_model.user_id == models.User.user_id
+    ).filter(like_column == parent_id)
 
-    if existing_like:
+
+@router.post("/posts/{post_id}", status_code=status.HTTP_201_CREATED, response_model=schemas.PostLikeResponse)
+async def like_post(post_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(oauth2_service.get_current_principal)):
+    liked = add_like(models.PostsLike.blog_post_id, models.BlogPost.post_id, "uq_posts_likes_user_post", current_user.user_id, post_id)
+    try:
+        like_count = await db.scalar(post_likes.change(liked, 1))
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        oauth2_service.raise_for_deleted_user(error)
+        # The post was deleted while it was being liked.
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Post with ID {post_id} does not exist.") from error
+    await response_cache.invalidate(post_key(post_id))
+
+    if like_count is None:
+        if not await exists(db, models.BlogPost.post_id, post_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Post with ID {post_id} does not exist."
+            )
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"You have already liked post {post_id}."
         )
-    
-    new_like = models.PostsLike(blog_post_id=post_id, user_id=current_user.user_id)
-    post.like_count += 1
-    db.add(new_like)
-    db.commit()
-    db.refresh(post)
 
     return schemas.PostLikeResponse(
         message=f"Post {post_id} liked successfully.",
-        like_count=post.like_count
+        like_count=like_count
     )
 
 
 @router.delete("/posts/{post_id}", response_model=schemas.PostLikeResponse)
-def unlike_post(post_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2_service.get_current_user)):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == post_id).first()
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Post with ID {post_id} does not exist."
-        )
-
-    like_query = db.query(models.PostsLike).filter(
-        models.PostsLike.blog_post_id == post_id,
-        models.PostsLike.user_id == current_user.user_id
-    )
-    existing_like = like_query.first()
-    if not existing_like:
+async def unlike_post(post_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(oauth2_service.get_current_principal)):
+    unliked = remove_like(models.PostsLike.blog_post_id, current_user.user_id, post_id)
+    like_count = await db.scalar(post_likes.change(unliked, -1))
+    await db.commit()
+    await response_cache.invalidate(post_key(post_id))
+
+    if like_count is None:
+        if not await exists(db, models.BlogPost.post_id, post_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Post with ID {post_id} does not exist."
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"You haven't liked post {post_id}."
         )
 
-    like_query.delete()
-    post.like_count -= 1
-    db.commit()
-    db.refresh(post)
-
     return schemas.PostLikeResponse(
         message=f"Post {post_id} unliked successfully.",
-        like_count=post.like_count
+        like_count=like_count
     )
 
 
 @router.post("/comments/{comment_id}", status_code=status.HTTP_201_CREATED, response_model=schemas.CommentLikeResponse)
-def like_comment(comment_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2_service.get_current_user)):
-    comment = db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
-    if not comment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Comment with ID {comment_id} does not exist."
-        )
-
-    existing_like = db.query(models.CommentsLike).filter(
-        models.CommentsLike.comment_id == comment_id,
-        models.CommentsLike.user_id == current_user.user_id
-    ).first()
-
-    if existing_like:
+async def like_comment(comment_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(oauth2_service.get_current_principal)):
+    liked = add_like(models.CommentsLike.comment_id, models.Comment.comment_id, "uq_comments_likes_user_comment", current_user.user_id, comment_id)
+    try:
+        like_count = await db.scalar(comment_likes.change(liked, 1))
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        oauth2_service.raise_for_deleted_user(error)
+        # The comment was deleted while it was being liked.
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Comment with ID {comment_id} does not exist.") from error
+    await response_cache.invalidate(comment_key(comment_id))
+
+    if like_count is None:
+        if not await exists(db, models.Comment.comment_id, comment_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Comment with ID {comment_id} does not exist."
+            )
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"You have already liked comment {comment_id}."
         )
 
-    new_like = models.CommentsLike(comment_id=comment_id, user_id=current_user.user_id)
-    comment.like_count += 1
-    db.add(new_like)
-    db.commit()
-    db.refresh(comment)
-
     return schemas.CommentLikeResponse(
         message=f"Comment {comment_id} liked successfully.",
-        like_count=comment.like_count
+        like_count=like_count
     )
 
 
 @router.delete("/comments/{comment_id}", response_model=schemas.CommentLikeResponse)
-def unlike_comment(comment_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2_service.get_current_user)):
-    comment = db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
-    if not comment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Comment with ID {comment_id} does not exist."
-        )
-
-    like_query = db.query(models.CommentsLike).filter(
-        models.CommentsLike.comment_id == comment_id,
-        models.CommentsLike.user_id == current_user.user_id
-    )
-    existing_like = like_query.first()
-    if not existing_like:
+async def unlike_comment(comment_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(oauth2_service.get_current_principal)):
+    unliked = remove_like(models.CommentsLike.comment_id, current_user.user_id, comment_id)
+    like_count = await db.scalar(comment_likes.change(unliked, -1))
+    await db.commit()
+    await response_cache.invalidate(comment_key(comment_id))
+
+    if like_count is None:
+        if not await exists(db, models.Comment.comment_id, comment_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Comment with ID {comment_id} does not exist."
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"You haven't liked comment {comment_id}."
         )
 
-    like_query.delete()
-    comment.like_count -= 1
-    db.commit()
-    db.refresh(comment)
-
     return schemas.CommentLikeResponse(
         message=f"Comment {comment_id} unliked successfully.",
-        like_count=comment.like_count
+        like_count=like_count
     )
 
+@router.get("/posts", response_model=schemas.LikedIds)
+async def get_liked_posts(ids: List[int] = Query(max_length=MAX_LOOKUP_IDS), db: AsyncSession = Depends(get_read_db), current_user=Depends(oauth2_service.get_current_principal)):
+    liked = await db.scalars(select_liked(models.PostsLike.blog_post_id, current_user.user_id, ids))
+    return schemas.LikedIds(liked=sorted(liked.all()))
+
+@router.get("/comments", response_model=schemas.LikedIds)
+async def get_liked_comments(ids: List[int] = Query(max_length=MAX_LOOKUP_IDS), db: AsyncSession = Depends(get_read_db), current_user=Depends(oauth2_service.get_current_principal)):
+    liked = await db.scalars(select_liked(models.CommentsLike.comment_id, current_user.user_id, ids))
+    return schemas.LikedIds(liked=sorted(liked.all()))
+
 @router.get("/posts/{post_id}/users", response_model=List[schemas.UserOutPublic])
-def get_users_who_liked_post(post_id: int, db: Session = Depends(get_db), current_user=Depends(oauth2_service.get_current_user), limit: int = 10, skip: int = 0):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == post_id).first()
+async def get_users_who_liked_post(post_id: int, response: Response, db: AsyncSession = Depends(get_read_db), current_user=Depends(oauth2_service.get_current_principal), limit: int = 10, skip: int = 0, cursor: Optional[str] = None):
+    post = await db.scalar(select(models.BlogPost).filter(models.BlogPost.post_id == post_id))
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Post with ID {post_id} does not exist."
         )
 
-    user_query = db.query(models.User).join(models.PostsLike, models.PostsLike.user_id == models.User.user_id).filter(models.PostsLike.blog_post_id == post_id)
-
-    users = user_query.offset(skip).limit(limit).all()
+    likes = (await db.execute(paginate(select_likers(models.PostsLike.blog_post_id, post_id), models.PostsLike.created_at, models.PostsLike.id, limit, skip, cursor))).all()
+    set_next_cursor(response, likes, limit, "id")
 
-    return users
+    return json_list_response(serialize_user_public, (like.User for like in likes), response)
 
 @router.get("/comments/{comment_id}/users", response_model=List[schemas.UserOutPublic])
-def get_users_who_liked_comment(comment_id: int, db: Session = Depends(get_db), limit: int = 10, skip: int = 0):
-    comment = db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
+async def get_users_who_liked_comment(comment_id: int, response: Response, db: AsyncSession = Depends(get_read_db), limit: int = 10, skip: int = 0, cursor: Optional[str] = None):
+    comment = await db.scalar(select(models.Comment).filter(models.Comment.comment_id == comment_id))
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Comment with ID {comment_id} does not exist."
         )
 
-    user_query = db.query(models.User).join(
-        models.CommentsLike, models.CommentsLike.user_id == models.User.user_id
-    ).filter(
-        models.CommentsLike.comment_id == comment_id
-    )
-
-    users = user_query.offset(skip).limit(limit).all()
+    likes = (await db.execute(paginate(select_likers(models.CommentsLike.comment_id, comment_id), models.CommentsLike.created_at, models.CommentsLike.id, limit, skip, cursor))).all()
+    set_next_cursor(response, likes, limit, "id")
 
-    return users
\ No newline at end of file
+    return json_list_response(serialize_user_public, (like.User for like in likes), response)
\ No newline at end of file
@@ -0,0 +1,70 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.database import async_engine, replica_router
+from app.services.metrics_service import request_metrics, gauge, counter
+from app.services.pool_service import pool_status
+from app.services.password_service import password_hasher
+from app.services.response_cache_service import response_cache
+from app.services.compression_service import compressor
+
+router = APIRouter(
+    tags=["Metrics"]
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def pool_lines() -> list:
+    pools = [({"pool": "primary"}, pool_status(async_engine.pool))]
+    pools += [({"pool": replica.engine.url.render_as_string(hide_password=True)}, pool_status(replica.engine.pool)) for replica in replica_router.replicas]
+    lines = []
+    for name, help, field, type in [
+        ("db_pool_size", "Connections the pool keeps open.", "pool_size", "gauge"),
+        ("db_pool_checked_out", "Connections in use.", "checked_out", "gauge"),
+        ("db_pool_idle", "Connections waiting in the pool.", "idle", "gauge"),
+        ("db_pool_overflow", "Connections opened beyond pool_size.", "overflow", "gauge"),
+        ("db_pool_checkouts_total", "Connections checked out of the pool.", "checkouts", "counter"),
+        ("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout.", "checkout_timeouts", "counter"),
+        ("db_pool_checkout_wait_seconds_max", "Longest wait for a connection.", "wait_seconds_max", "gauge"),
+    ]:
+        lines += gauge(name, help, [(labels, status[field]) for labels, status in pools], type=type)
+    lines += counter("db_pool_checkout_wait_seconds_total", "Time spent waiting for connections.",
+                     [(labels, status["wait_seconds_avg"] * status["checkouts"]) for labels, status in pools])
+    return lines
+
+def password_hash_lines() -> list:
+    return (
+        gauge("password_hash_in_flight", "Bcrypt operations running or queued.", [({}, password_hasher.in_flight)])
+        + counter("password_hash_rejected_total", "Bcrypt operations refused with 503.", [({}, password_hasher.rejected)])
+        + counter("password_hash_seconds_count", "Bcrypt operations completed.", [({}, password_hasher.completed)])
+        + counter("password_hash_seconds_sum", "Time spent in bcrypt.", [({}, password_hasher.hash_seconds_total)])
+        + gauge("password_hash_seconds_max", "Slowest bcrypt operation.", [({}, password_hasher.hash_seconds_max)])
+        + counter("password_hash_wait_seconds_sum", "Time bcrypt operations waited for a worker.", [({}, password_hasher.wait_seconds_total)])
+    )
+
+def response_cache_lines() -> list:
+    cache = response_cache.stats()
+    return (
+        counter("response_cache_hits_total", "Reads answered from the response cache.",
+                [({"level": "l1"}, cache["l1_hits"]), ({"level": "l2"}, cache["l2_hits"])])
+        + counter("response_cache_misses_total", "Reads that went to the database.", [({}, cache["misses"])])
+        + counter("response_cache_invalidations_total", "Keys invalidated after writes.", [({}, cache["invalidations"])])
+        + counter("response_cache_l2_errors_total", "Failed calls to the shared cache.", [({}, cache["l2_errors"])])
+    )
+
+def compression_lines() -> list:
+    stats = compressor.stats
+    return (
+        counter("http_responses_compressed_total", "Responses sent compressed, by encoding.",
+                [({"encoding": encoding}, count) for encoding, count in stats.responses.items()])
+        + counter("http_response_bytes_uncompressed_total", "Body bytes before compression.",
+                  [({"encoding": encoding}, count) for encoding, count in stats.bytes_in.items()])
+        + counter("http_response_bytes_compressed_total", "Body bytes sent after compression.",
+                  [({"encoding": encoding}, count) for encoding, count in stats.bytes_out.items()])
+        + counter("http_response_compression_saved_bytes_total", "Body bytes compression kept off the wire.",
+                  [({"encoding": encoding}, stats.bytes_saved(encoding)) for encoding in stats.bytes_in])
+    )
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    lines = request_metrics.render() + pool_lines() + password_hash_lines() + response_cache_lines() + compression_lines()
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_CONTENT_TYPE)
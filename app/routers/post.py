@@ -1,59 +1,151 @@
-from fastapi import HTTPException, status, Response, Depends, APIRouter
+import orjson
+from fastapi import HTTPException, status, Request, Response, Depends, APIRouter, Query
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app import models, schemas
 from app.services import oauth2_service
-from ..database import get_db
+from app.services.response_cache_service import response_cache, post_key, comment_key, pack_entry, unpack_entry
+from app.services.trending_service import trending_feed
+from ..database import get_db, get_read_db, primary_session
+from ..pagination import paginate, set_next_cursor
+from ..conditional import make_etag, versions_etag, is_not_modified, validator_headers, not_modified
+from ..serializers import serialize_post, dump_json, json_list_response
 
 router = APIRouter(
     prefix = "/posts",
     tags=["Posts"]
 )
 
+def select_posts():
+    # The author is serialized with every post and async sessions cannot lazy load it.
+    return select(models.BlogPost).options(joinedload(models.BlogPost.author), models.with_like_count(models.BlogPost))
+
+def select_post_versions():
+    # Everything a PostReturn shows that can change, without the title and content.
+    return select(models.BlogPost.post_id, models.BlogPost.updated_at, models.total_like_count(models.BlogPost).label("like_count"),
+                  models.User.username, models.User.first_name, models.User.last_name).join(models.BlogPost.author)
+
+def post_version(post: models.BlogPost):
+    return (post.post_id, post.updated_at, post.like_count, post.author.username, post.author.first_name, post.author.last_name)
+
+def search_query(search: str):
+    # websearch_to_tsquery accepts what users type into a search box ("quoted phrases", -exclusions, or).
+    return func.websearch_to_tsquery('english', search)
+
+def filter_search(query, search: str):
+    return query.filter(models.BlogPost.search_vector.op('@@')(search_query(search)))
+
+def rank_search(query, search: str):
+    # Best matches first, by how many of the terms a post has and how close together.
+    tsquery = search_query(search)
+    rank = func.ts_rank_cd(models.BlogPost.search_vector, tsquery)
+    return query.filter(models.BlogPost.search_vector.op('@@')(tsquery)).order_by(rank.desc(), models.BlogPost.post_id.desc())
+
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.PostReturn)
-def create_post(post: schemas.PostCreate, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
+async def create_post(post: schemas.PostCreate, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
     newPost = models.BlogPost(**post.model_dump(), user_id= current_user.user_id)
     db.add(newPost)
-    db.commit()
-    db.refresh(newPost)
-    return newPost
+    try:
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        oauth2_service.raise_for_deleted_user(error)
+        raise
+    return await db.scalar(select_posts().filter(models.BlogPost.post_id == newPost.post_id).execution_options(populate_existing=True))
 
 @router.get("/", response_model=List[schemas.PostReturn])
-def get_posts(db: Session = Depends(get_db), limit: int = 10, skip: int = 0, search: Optional[str] = ""):
-    return db.query(models.BlogPost).filter(models.BlogPost.content.contains(search)).limit(limit).offset(skip)
+async def get_posts(request: Request, response: Response, db: AsyncSession = Depends(get_read_db), limit: int = 10, skip: int = 0, search: Optional[str] = "", cursor: Optional[str] = None):
+    def page(query):
+        if search:
+            query = filter_search(query, search)
+        return paginate(query, models.BlogPost.created_at, models.BlogPost.post_id, limit, skip, cursor)
+
+    if "if-none-match" in request.headers:
+        versions = (await db.execute(page(select_post_versions()))).all()
+        etag = versions_etag(versions)
+        if is_not_modified(request, etag):
+            return not_modified(etag, max((version.updated_at for version in versions), default=None))
+
+    posts = (await db.scalars(page(select_posts()))).all()
+    set_next_cursor(response, posts, limit, "post_id")
+    response.headers.update(validator_headers(versions_etag(map(post_version, posts)), max((post.updated_at for post in posts), default=None)))
+    return json_list_response(serialize_post, posts, response)
+
+@router.get("/search", response_model=List[schemas.PostReturn])
+async def search_posts(request: Request, response: Response, q: str = Query(min_length=1), db: AsyncSession = Depends(get_read_db), limit: int = 10, skip: int = 0):
+    def page(query):
+        return rank_search(query, q).limit(limit).offset(skip)
+
+    if "if-none-match" in request.headers:
+        versions = (await db.execute(page(select_post_versions()))).all()
+        etag = versions_etag(versions)
+        if is_not_modified(request, etag):
+            return not_modified(etag, max((version.updated_at for version in versions), default=None))
+
+    posts = (await db.scalars(page(select_posts()))).all()
+    response.headers.update(validator_headers(versions_etag(map(post_version, posts)), max((post.updated_at for post in posts), default=None)))
+    return json_list_response(serialize_post, posts, response)
+
+# Declared before /{id}, which would otherwise take "trending" for an id.
+@router.get("/trending", response_model=List[schemas.PostReturn])
+async def get_trending_posts(request: Request, db: AsyncSession = Depends(get_read_db), limit: int = 10, skip: int = 0):
+    # Served from the in-memory snapshot; the database is only read when it has gone stale.
+    posts = await trending_feed.get(db)
+    body = orjson.dumps(posts[max(skip, 0):max(skip, 0) + max(limit, 0)])
+    etag = make_etag(body)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag))
 
 @router.get("/{id}", response_model=schemas.PostReturn)
-def get_post(id: int, db: Session = Depends(get_db)):
-    post = db.query(models.BlogPost).filter(models.BlogPost.post_id == id).first()
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with ID {id} was not found.")
-    return post
+async def get_post(id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    entry = await response_cache.get(post_key(id))
+    if entry is None:
+        async with response_cache.filling(post_key(id)) as fill:
+            async with primary_session(db) as source:
+                post = await source.scalar(select_posts().filter(models.BlogPost.post_id == id))
+            if not post:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with ID {id} was not found.")
+            entry = pack_entry(dump_json(serialize_post, post), post.updated_at)
+            await fill(entry)
+    body, last_modified = unpack_entry(entry)
+    etag = make_etag(body)
+    if is_not_modified(request, etag):
+        return not_modified(etag, last_modified)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag, last_modified))
 
 @router.put("/{id}", response_model=schemas.PostReturn)
-def update_post(id: int, editedPost: schemas.PostCreate, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
-    post_query = db.query(models.BlogPost).filter(models.BlogPost.post_id == id)
-    post = post_query.first()
+async def update_post(id: int, editedPost: schemas.PostCreate, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
+    post = await db.scalar(select(models.BlogPost).filter(models.BlogPost.post_id == id))
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                          detail=f"post with ID {id} was not found")
     if post.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN , detail=f"Post with ID {id} doesn't belong to the current user to edit it.")
-    post_query.update(editedPost.model_dump(), synchronize_session=False)
-    db.commit()
-    return post_query.first()
+    await db.execute(update(models.BlogPost).filter(models.BlogPost.post_id == id).values(**editedPost.model_dump()).execution_options(synchronize_session=False))
+    await db.commit()
+    await response_cache.invalidate(post_key(id))
+    return await db.scalar(select_posts().filter(models.BlogPost.post_id == id).execution_options(populate_existing=True))
 
 @router.delete("/{id}")
-def delete_post(id: int, db: Session = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_user)):
-    post_query = db.query(models.BlogPost).filter(models.BlogPost.post_id == id)
-    post = post_query.first()
-    
+async def delete_post(id: int, db: AsyncSession = Depends(get_db), current_user: int = Depends(oauth2_service.get_current_principal)):
+    post = await db.scalar(select(models.BlogPost).filter(models.BlogPost.post_id == id))
+
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                         detail=f"post with ID {id} was not found so it was not deleted.") 
-        
+                         detail=f"post with ID {id} was not found so it was not deleted.")
+
     if post.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Post with ID {id} doesn't belong to the current user to delete it.")
-    post_query.delete()
-    db.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    # Its comments are deleted with it, so they leave the cache too.
+    comment_ids = await db.scalars(select(models.Comment.comment_id).filter(models.Comment.blog_post_id == id))
+    comment_keys = [comment_key(comment_id) for comment_id in comment_ids]
+    await db.execute(delete(models.BlogPost).filter(models.BlogPost.post_id == id).execution_options(synchronize_session=False))
+    await db.commit()
+    await response_cache.invalidate(post_key(id), *comment_keys)
+    trending_feed.discard(id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Response
-from app.schemas import UserCreate, UserOut, UserEdit
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.utils import hash_password, remove_attribute, verify_password
-from app.models import User
+from fastapi import APIRouter, HTTPException, status, Depends, Response, Query
+from fastapi.responses import StreamingResponse
+from app.schemas import UserCreate, UserOut, UserEdit, PostExport, CommentExport, PostLikeExport, CommentLikeExport
+from sqlalchemy import select, update, delete, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_read_db
+from app.utils import remove_attribute
+from app.services.password_service import password_hasher
+from app.models import User, BlogPost, Comment, PostsLike, CommentsLike, with_like_count
 from app.services import oauth2_service
+from app.services.response_cache_service import response_cache, user_content_keys
 from app.config import settings
-from typing import List
+from app.pagination import paginate, set_next_cursor
+from typing import List, Optional, Literal
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 router = APIRouter(
@@ -15,87 +20,147 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user_details: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_details: UserCreate, db: AsyncSession = Depends(get_db)):
     if user_details.admin and user_details.root_pass != settings.root_pass:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not allowed to create an admin user unless you have the master root password")
-    
+
     user_details = remove_attribute(user_details, "root_pass")
-    user_details.password = hash_password(user_details.password)
+    user_details.password = await password_hasher.hash(user_details.password)
     newUser = User(**user_details.model_dump())
     try:
         db.add(newUser)
-        db.commit()
-        db.refresh(newUser)
+        await db.commit()
+        await db.refresh(newUser)
         return newUser
     except Exception as error:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Duplicate entry")
-    
+
 @router.put("/", response_model=UserOut)
-def update_current_user(user_details: UserEdit, current_user = Depends(oauth2_service.get_current_user), db: Session = Depends(get_db)):
-    user_query = db.query(User).filter(User.user_id == current_user.user_id)
+async def update_current_user(user_details: UserEdit, current_user = Depends(oauth2_service.get_current_principal), db: AsyncSession = Depends(get_db)):
     if user_details.password != None:
-        user_details.password = hash_password(user_details.password)
+        user_details.password = await password_hasher.hash(user_details.password)
     user_details_to_add = {}
     for field, value in user_details.model_dump().items():
         if value != None:
             user_details_to_add[field] = value
-    user_query.update(user_details_to_add, synchronize_session=False)
-    db.commit()
-    return user_query.first()
+    await db.execute(update(User).filter(User.user_id == current_user.user_id).values(**user_details_to_add).execution_options(synchronize_session=False))
+    await db.commit()
+    oauth2_service.invalidate_user(current_user.user_id)
+    await response_cache.invalidate(*await user_content_keys(db, current_user.user_id))
+    return await db.scalar(select(User).filter(User.user_id == current_user.user_id).execution_options(populate_existing=True))
 
 @router.put("/{username}", response_model=UserOut)
-def update_user(username: str, user_details: UserEdit, current_user = Depends(oauth2_service.get_current_user), db: Session = Depends(get_db)):
+async def update_user(username: str, user_details: UserEdit, current_user = Depends(oauth2_service.get_current_principal), db: AsyncSession = Depends(get_db)):
     if not current_user.admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Only admins are allowed to edit other users")
-    
-    user_query = db.query(User).filter(User.username == username)
-    
-    userToEdit = user_query.first()
+
+    userToEdit = await db.scalar(select(User).filter(User.username == username))
     if not userToEdit:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"You are trying to edit user {username} which does not exist")
-    
-    
+
+
     if user_details.password != None:
-        user_details.password = hash_password(user_details.password)
-        
+        user_details.password = await password_hasher.hash(user_details.password)
+
     user_details_to_add = {}
     for field, value in user_details.model_dump().items():
         if value != None:
             user_details_to_add[field] = value
-            
-    user_query.update(user_details_to_add, synchronize_session=False)
-    db.commit()
-    return user_query.first()
+
+    await db.execute(update(User).filter(User.user_id == userToEdit.user_id).values(**user_details_to_add).execution_options(synchronize_session=False))
+    await db.commit()
+    oauth2_service.invalidate_user(userToEdit.user_id)
+    await response_cache.invalidate(*await user_content_keys(db, userToEdit.user_id))
+    return await db.scalar(select(User).filter(User.user_id == userToEdit.user_id).execution_options(populate_existing=True))
+
+def prefix_pattern(prefix: str):
+    escaped = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+EXPORT_CHUNK_SIZE = 1000
+
+def select_users(search: Optional[str] = None, admin: Optional[bool] = None):
+    query = select(User)
+    if search:
+        # Matches the start of the username or email, using the lower() text_pattern_ops indexes.
+        pattern = prefix_pattern(search)
+        query = query.filter(or_(func.lower(User.username).like(pattern, escape="\\"), func.lower(User.email).like(pattern, escape="\\")))
+    if admin is not None:
+        query = query.filter(User.admin == admin)
+    return query
+
+def export_queries(user_id: int) -> list:
+    # What /me/export sends, in order, with the schema of each.
+    return [
+        (select(BlogPost).options(with_like_count(BlogPost)).filter(BlogPost.user_id == user_id).order_by(BlogPost.post_id), PostExport),
+        (select(Comment).options(with_like_count(Comment)).filter(Comment.user_id == user_id).order_by(Comment.comment_id), CommentExport),
+        (select(PostsLike).filter(PostsLike.user_id == user_id).order_by(PostsLike.id), PostLikeExport),
+        (select(CommentsLike).filter(CommentsLike.user_id == user_id).order_by(CommentsLike.id), CommentLikeExport),
+    ]
 
 @router.get("/", response_model=List[UserOut])
-def get_users(current_user = Depends(oauth2_service.get_current_user), db: Session = Depends(get_db)):
+async def get_users(response: Response, current_user = Depends(oauth2_service.get_current_principal), db: AsyncSession = Depends(get_read_db),
+                    limit: int = Query(default=100, ge=1, le=1000), skip: int = 0, cursor: Optional[str] = None,
+                    search: Optional[str] = None, admin: Optional[bool] = None, format: Literal["json", "ndjson"] = "json"):
     if not current_user.admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins are allowed to list other users")
-    
-    return db.query(User).all()
+
+    query = select_users(search, admin)
+
+    if format == "ndjson":
+        # Every matching user, read through a server side cursor and sent EXPORT_CHUNK_SIZE
+        # rows at a time, so memory stays flat.
+        async def export_users():
+            users = await db.stream_scalars(query.order_by(User.created_at, User.user_id).execution_options(yield_per=EXPORT_CHUNK_SIZE))
+            async for partition in users.partitions():
+                yield "".join(UserOut.model_validate(user, from_attributes=True).model_dump_json() + "\n" for user in partition)
+        return StreamingResponse(export_users(), media_type="application/x-ndjson")
+
+    users = (await db.scalars(paginate(query, User.created_at, User.user_id, limit, skip, cursor))).all()
+    set_next_cursor(response, users, limit, "user_id")
+    return users
+
+@router.get("/me/export")
+async def export_current_user(current_user = Depends(oauth2_service.get_current_principal), db: AsyncSession = Depends(get_read_db)):
+    # Posts, comments and likes as one NDJSON line each, read through server side cursors
+    # EXPORT_CHUNK_SIZE rows at a time so memory stays flat however long the history is.
+    async def export_rows():
+        for query, schema in export_queries(current_user.user_id):
+            rows = await db.stream_scalars(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+            async for partition in rows.partitions():
+                yield "".join(schema.model_validate(row, from_attributes=True).model_dump_json() + "\n" for row in partition)
+                # The rows were serialized, so don't keep them in the session's identity map.
+                db.expunge_all()
+
+    return StreamingResponse(export_rows(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="export.ndjson"'})
 
 @router.delete("/")
-def remove_account(userCredentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user_query = db.query(User).filter(User.username == userCredentials.username)
-    user = user_query.first()
+async def remove_account(userCredentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).filter(User.username == userCredentials.username))
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
-    if not verify_password(userCredentials.password, user.password):
+    if not await password_hasher.verify(userCredentials.password, user.password):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
-    user_query.delete()
-    db.commit()
+    cache_keys = await user_content_keys(db, user.user_id)
+    await db.execute(delete(User).filter(User.user_id == user.user_id).execution_options(synchronize_session=False))
+    await db.commit()
+    oauth2_service.invalidate_user(user.user_id)
+    await response_cache.invalidate(*cache_keys)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.delete("/{username}")
-def remove_user(username: str, current_user = Depends(oauth2_service.get_current_user), db: Session = Depends(get_db)):
+async def remove_user(username: str, current_user = Depends(oauth2_service.get_current_principal), db: AsyncSession = Depends(get_db)):
     if not current_user.admin:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Only admins are allowed to delete other users") 
-      
-    user_query = db.query(User).filter(User.username == username)
-    userToDelete = user_query.first()
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Only admins are allowed to delete other users")
+
+    userToDelete = await db.scalar(select(User).filter(User.username == username))
     if not userToDelete:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"You are trying to delete {username} which does not exist")
-    
-    user_query.delete()
-    db.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+
+    cache_keys = await user_content_keys(db, userToDelete.user_id)
+    await db.execute(delete(User).filter(User.user_id == userToDelete.user_id).execution_options(synchronize_session=False))
+    await db.commit()
+    oauth2_service.invalidate_user(userToDelete.user_id)
+    await response_cache.invalidate(*cache_keys)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
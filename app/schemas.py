@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from pydantic_extra_types.phone_numbers import PhoneNumber
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import date, datetime
 
 class UserSchema(BaseModel):
@@ -25,6 +25,11 @@ class UserOutPublic(BaseModel):
     first_name: str
     last_name: str
     
+class CurrentUser(BaseModel):
+    user_id: int
+    username: str
+    admin: bool
+
 class UserEdit(BaseModel):
     username: Optional[str] = None   
     first_name: Optional[str] = None
@@ -40,6 +45,8 @@ class Token(BaseModel):
     
 class TokenData(BaseModel):
     id: Optional[int] = None
+    username: Optional[str] = None
+    admin: Optional[bool] = None
     
 class PostBase(BaseModel):
     title: str
@@ -83,5 +90,79 @@ class CommentLikeResponse(BaseModel):
     message: str
     like_count: int
 
+class PostExport(PostBase):
+    type: Literal["post"] = "post"
+    post_id: int
+    created_at: datetime
+    updated_at: datetime
+    like_count: int
+
+class CommentExport(CommentBase):
+    type: Literal["comment"] = "comment"
+    comment_id: int
+    blog_post_id: int
+    created_at: datetime
+    updated_at: datetime
+    like_count: int
+
+class PostLikeExport(PostLikeBase):
+    type: Literal["post_like"] = "post_like"
+    created_at: datetime
+
+class CommentLikeExport(CommentLikeBase):
+    type: Literal["comment_like"] = "comment_like"
+    created_at: datetime
+
+class LikedIds(BaseModel):
+    liked: List[int]
+
 class UsersWhoLiked(BaseModel):
-    users: List[UserOutPublic]
\ No newline at end of file
+    users: List[UserOutPublic]
+class PoolStatus(BaseModel):
+    pool_size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    checkout_timeouts: int
+    wait_seconds_avg: float
+    wait_seconds_max: float
+
+
+class PasswordHashingStatus(BaseModel):
+    workers: int
+    queue_limit: int
+    in_flight: int
+    queue_depth: int
+    completed: int
+    rejected: int
+    hash_seconds_avg: float
+    hash_seconds_max: float
+    wait_seconds_avg: float
+
+
+class ResponseCacheStatus(BaseModel):
+    l1_size: int
+    l2_enabled: bool
+    l1_hits: int
+    l2_hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    l2_errors: int
+
+
+class ReplicaStatus(BaseModel):
+    url: str
+    healthy: bool
+    checked_out: int
+
+
+class LikeCounterCompaction(BaseModel):
+    posts: int
+    comments: int
+
+
+class TrendingRefreshResult(BaseModel):
+    ranked_posts: int
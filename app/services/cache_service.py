@@ -0,0 +1,48 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A bounded in-process LRU cache whose entries also expire after `ttl` seconds.
+
+    It is only touched from the event loop, so it does not lock. `invalidations` counts the
+    calls to `pop` and `clear`, so a caller filling an entry from a read that awaited can tell
+    whether an invalidation happened meanwhile.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.invalidations = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self.invalidations += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.invalidations += 1
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
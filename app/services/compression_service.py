@@ -0,0 +1,319 @@
+import zlib
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/problem+json")
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self):
+        return GzipStream(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+
+class GzipStream:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed after every chunk, so streamed rows reach the client as they are produced.
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, brotli, quality: int):
+        self.brotli = brotli
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return self.brotli.compress(data, quality=self.quality)
+
+    def stream(self):
+        return BrotliStream(self.brotli.Compressor(quality=self.quality))
+
+
+class BrotliStream:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, zstandard, level: int):
+        self.zstandard = zstandard
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def stream(self):
+        return ZstdStream(self.compressor.compressobj(), self.zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+class ZstdStream:
+    def __init__(self, compressor, flush_block):
+        self.compressor = compressor
+        self.flush_block = flush_block
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(self.flush_block)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+def available_codecs(gzip_level: int, brotli_quality: int, zstd_level: int) -> list:
+    """
+    The codecs this process can offer, best first. Brotli and zstd are used when the
+    `brotli` and `zstandard` packages are installed, gzip always.
+    """
+    codecs = []
+    try:
+        import brotli
+        codecs.append(BrotliCodec(brotli, brotli_quality))
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        codecs.append(ZstdCodec(zstandard, zstd_level))
+    except ImportError:
+        pass
+    codecs.append(GzipCodec(gzip_level))
+    return codecs
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """
+    `{coding: q}` of an Accept-Encoding header, with codings lowercased.
+    """
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header: str, codecs: list):
+    """
+    The codec to answer a request with, or None to send the body as is. Among the codecs
+    the client accepts, the one with the highest q wins, ties going to the server's order.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = accepted.get(codec.name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def encoded_etag(etag: str, codec) -> str:
+    # A strong ETag names exact bytes, so each encoding gets its own. Weak ones stay as they are.
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{codec.name}"'
+    return etag
+
+
+def decoded_if_none_match(header: str, codecs: list) -> str:
+    """
+    `If-None-Match` with the encoding suffixes of `encoded_etag` removed, as the app knows its ETags.
+    """
+    suffixes = [f'-{codec.name}"' for codec in codecs]
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        for suffix in suffixes:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        tags.append(tag)
+    return ", ".join(tags)
+
+
+class CompressionStats:
+    """
+    Compressed responses by encoding, and their bytes before and after compression.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.bytes_in = {}
+        self.bytes_out = {}
+
+    def observe(self, encoding: str, bytes_in: int, bytes_out: int, responses: int = 0):
+        self.responses[encoding] = self.responses.get(encoding, 0) + responses
+        self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+        self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+
+    def bytes_saved(self, encoding: str) -> int:
+        return self.bytes_in[encoding] - self.bytes_out[encoding]
+
+
+class Compressor:
+    """
+    Compression settings shared by the middleware: the codecs on offer, the smallest body
+    worth compressing, and the size from which a body is compressed in the threadpool
+    rather than on the event loop.
+    """
+
+    def __init__(self, codecs: list, minimum_size: int, offload_min_bytes: int):
+        self.codecs = codecs
+        self.minimum_size = minimum_size
+        self.offload_min_bytes = offload_min_bytes
+        self.stats = CompressionStats()
+
+    async def run(self, function, data: bytes) -> bytes:
+        if len(data) >= self.offload_min_bytes:
+            # zlib, brotli and zstd release the GIL while they work.
+            return await run_in_threadpool(function, data)
+        return function(data)
+
+
+def header_value(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing text and JSON responses with the best encoding the
+    client accepts. Bodies sent whole are compressed from `minimum_size` bytes up; streamed
+    bodies are compressed chunk by chunk, flushed after each. Compressed responses get
+    `Vary: Accept-Encoding`, and their strong ETags a `-<encoding>` suffix, which is removed
+    again from `If-None-Match` before the app compares it.
+    """
+
+    def __init__(self, app, compressor: Compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = header_value(scope["headers"], b"accept-encoding")
+        codec = negotiate(accept_encoding.decode("latin-1"), self.compressor.codecs) if accept_encoding else None
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = header_value(scope["headers"], b"if-none-match")
+        if if_none_match is not None:
+            decoded = decoded_if_none_match(if_none_match.decode("latin-1"), self.compressor.codecs).encode("latin-1")
+            # Rewritten in place: the router stores the matched route in this scope, and the
+            # metrics and profiling middlewares around this one read it from there.
+            scope["headers"] = [(key, decoded if key.lower() == b"if-none-match" else value) for key, value in scope["headers"]]
+        client_tags = {tag.strip() for tag in if_none_match.decode("latin-1").split(",")} if if_none_match is not None else set()
+
+        compressor = self.compressor
+        start_message = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, stream, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                etag = header_value(headers, b"etag")
+                status = message["status"]
+                if status == 304 and etag is not None and encoded_etag(etag.decode("latin-1"), codec) in client_tags:
+                    # The client holds the compressed representation: confirm it under its own ETag.
+                    message = dict(message, headers=replace_header(headers, b"etag", encoded_etag(etag.decode("latin-1"), codec).encode("latin-1")))
+                content_type = (header_value(headers, b"content-type") or b"").decode("latin-1")
+                if (status < 200 or status in (204, 304) or header_value(headers, b"content-encoding") is not None
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether it is worth compressing.
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                if not more_body and len(body) < compressor.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                headers = [(key, value) for key, value in start_message.get("headers", []) if key.lower() != b"content-length"]
+                headers = add_vary(headers) + [(b"content-encoding", codec.name.encode())]
+                etag = header_value(headers, b"etag")
+                if etag is not None:
+                    headers = replace_header(headers, b"etag", encoded_etag(etag.decode("latin-1"), codec).encode("latin-1"))
+                if not more_body:
+                    compressed = await compressor.run(codec.compress, body)
+                    compressor.stats.observe(codec.name, len(body), len(compressed), responses=1)
+                    await send(dict(start_message, headers=headers + [(b"content-length", str(len(compressed)).encode())]))
+                    await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                    return
+                await send(dict(start_message, headers=headers))
+                start_message = None
+                stream = codec.stream()
+                compressor.stats.observe(codec.name, 0, 0, responses=1)
+
+            compressed = await compressor.run(stream.chunk, body) if body else b""
+            if not more_body:
+                compressed += stream.finish()
+            compressor.stats.observe(codec.name, len(body), len(compressed))
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def replace_header(headers, name: bytes, value: bytes) -> list:
+    return [(key, value if key.lower() == name else current) for key, current in headers]
+
+def add_vary(headers) -> list:
+    vary = header_value(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower():
+        return headers
+    return replace_header(headers, b"vary", vary + b", Accept-Encoding")
+
+
+compressor = Compressor(
+    available_codecs(settings.compression_gzip_level, settings.compression_brotli_quality, settings.compression_zstd_level),
+    settings.compression_minimum_size,
+    settings.compression_offload_min_bytes,
+)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import random
+from sqlalchemy import select, update, delete, literal, func, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCounter:
+    """
+    Where the like count of one kind of parent row (posts or comments) is kept.
+
+    With `like_counter_shards` set, likes are added to one of N shard rows picked at random
+    instead of to the parent row, so a viral post doesn't serialize all of its likes on
+    a single row lock. `compact_like_counters` later folds the shards back into the row.
+    """
+
+    def __init__(self, parent_model, parent_id_column, shard_model, shard_parent_id_column):
+        self.parent_model = parent_model
+        self.parent_id_column = parent_id_column
+        self.shard_model = shard_model
+        self.shard_parent_id_column = shard_parent_id_column
+
+    def change(self, changed, delta: int):
+        """
+        Builds one statement that applies `delta` for the parent that the `changed` CTE
+        inserted or deleted a like for, and returns the parent's new like count.
+
+        :param changed: A data-modifying CTE returning the liked parent's id as `parent_id`.
+        """
+        if settings.like_counter_shards > 0:
+            shard = random.randrange(settings.like_counter_shards)
+            bumped = insert(self.shard_model).from_select(
+                [self.shard_parent_id_column.key, "shard", "delta"],
+                select(changed.c.parent_id, literal(shard, Integer), literal(delta, Integer))
+            ).on_conflict_do_update(
+                index_elements=[self.shard_parent_id_column.key, "shard"],
+                set_={"delta": self.shard_model.delta + delta}
+            ).returning(self.shard_parent_id_column.label("parent_id")).cte("bumped")
+            # Every part of the statement reads the same snapshot, which doesn't include this
+            # statement's own shard change yet, hence the + delta.
+            return select(models.total_like_count(self.parent_model) + delta).join(bumped, bumped.c.parent_id == self.parent_id_column)
+
+        return update(self.parent_model).filter(self.parent_id_column == changed.c.parent_id).values(
+            stored_like_count=self.parent_model.stored_like_count + delta
+        ).returning(models.total_like_count(self.parent_model)).execution_options(synchronize_session=False)
+
+    def compact(self):
+        """
+        Builds one statement that empties the shards and adds their sums to the parent rows.
+        """
+        drained = delete(self.shard_model).returning(
+            self.shard_parent_id_column.label("parent_id"), self.shard_model.delta
+        ).cte("drained")
+        totals = select(drained.c.parent_id, func.sum(drained.c.delta).label("delta")).group_by(drained.c.parent_id).cte("totals")
+        return update(self.parent_model).filter(self.parent_id_column == totals.c.parent_id).values(
+            stored_like_count=self.parent_model.stored_like_count + totals.c.delta,
+            # Folding likes in is not an edit of the post or comment.
+            updated_at=self.parent_model.updated_at
+        ).execution_options(synchronize_session=False)
+
+
+    def rebuild(self, like_model, like_parent_id_column):
+        """
+        Builds the statements that recount every parent's likes from the likes table and drop
+        its shards, e.g. after likes were bulk loaded behind the counters' back.
+        """
+        counted = select(func.count()).select_from(like_model).filter(like_parent_id_column == self.parent_id_column).scalar_subquery()
+        return [
+            delete(self.shard_model),
+            update(self.parent_model).filter(self.parent_model.stored_like_count.is_distinct_from(counted)).values(
+                stored_like_count=counted,
+                updated_at=self.parent_model.updated_at
+            ).execution_options(synchronize_session=False),
+        ]
+
+
+post_likes = LikeCounter(models.BlogPost, models.BlogPost.post_id, models.PostLikeShard, models.PostLikeShard.blog_post_id)
+comment_likes = LikeCounter(models.Comment, models.Comment.comment_id, models.CommentLikeShard, models.CommentLikeShard.comment_id)
+
+
+async def compact_like_counters(db: AsyncSession) -> dict:
+    """
+    Folds every like counter shard back into `blog_posts.like_count` and `comments.like_count`.
+
+    :return: How many posts and comments had shards folded in.
+    """
+    posts = await db.execute(post_likes.compact())
+    comments = await db.execute(comment_likes.compact())
+    await db.commit()
+    return {"posts": posts.rowcount, "comments": comments.rowcount}
+
+
+async def compact_periodically(session_factory, interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as db:
+                await compact_like_counters(db)
+        except Exception:
+            logger.exception("Compacting like counters failed")
@@ -0,0 +1,115 @@
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """
+    Request counts by route and status, and latency histograms by route.
+
+    Routes are the path templates (`/posts/{id}`), so the number of series stays bounded.
+    Recording a request is a few dictionary lookups and increments: each histogram is a
+    flat list of bucket counts allocated the first time its route is seen, and it is only
+    made cumulative when `/metrics` is scraped. It is only touched from the event loop,
+    so it does not lock.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self.requests = {}
+        self.durations = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.durations.get((method, route))
+        if histogram is None:
+            # One slot per bucket, one for +Inf, then the sum.
+            histogram = self.durations[(method, route)] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def render(self) -> list:
+        lines = [
+            "# HELP http_requests_in_flight Requests being handled right now.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests handled, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in self.requests.items():
+            lines.append(f'http_requests_total{{method="{method}",route="{escape(route)}",status="{status}"}} {count}')
+        lines += [
+            "# HELP http_request_duration_seconds Time to handle a request, by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in list(self.durations.items()):
+            labels = f'method="{method}",route="{escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += histogram[len(self.buckets)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram[-1]}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording every HTTP request into `metrics`.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            # The router stores the matched route in the scope.
+            route = scope.get("route")
+            metrics.observe(scope["method"], route.path if route is not None else "unmatched", status, time.perf_counter() - start)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def gauge(name: str, help: str, samples, type: str = "gauge") -> list:
+    """
+    Exposition lines of one metric.
+
+    :param samples: `(labels, value)` pairs, `labels` being a dict.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {type}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{escape(str(label))}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+def counter(name: str, help: str, samples) -> list:
+    return gauge(name, help, samples, type="counter")
+
+
+request_metrics = RequestMetrics()
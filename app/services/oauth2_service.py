@@ -3,11 +3,13 @@ from jwt.exceptions import InvalidTokenError
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app import schemas
 from app.models import User
 from app.config import settings
+from app.services.cache_service import TTLCache
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
@@ -15,29 +17,80 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="login")
 
-def create_jwt_token(data: dict):
+# The foreign keys from users' content to `users`, named by Postgres' default.
+USER_FOREIGN_KEYS = frozenset({"blog_posts_user_id_fkey", "comments_user_id_fkey", "posts_likes_user_id_fkey", "comments_likes_user_id_fkey"})
+
+# Authenticated users by user_id, so authenticated requests skip the user lookup.
+# Other pods only see a change once the entry expires, after `user_cache_ttl_seconds`.
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+def create_jwt_token(data: dict, expire_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES):
     to_encode = data.copy()
     
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + timedelta(minutes=expire_minutes)
     to_encode.update({"exp": expire})
     
     enocded_jwt = jwt.encode(payload=to_encode, key=SECRET_KEY, algorithm=ALGORITHM)
     
     return enocded_jwt
 
+def create_user_token(user):
+    # In claims mode the principal travels in the token, so it is kept short lived.
+    if settings.jwt_claims_mode:
+        return create_jwt_token(data={"user_id": user.user_id, "username": user.username, "admin": user.admin},
+                                expire_minutes=settings.jwt_claims_expire_minutes)
+    return create_jwt_token(data={"user_id": user.user_id})
+
 def verify_access_token(token: str, credentials_exception):
     try:
         payload = jwt.decode(jwt= token, key= SECRET_KEY, algorithms=[ALGORITHM])
         userId = payload.get("user_id")
         if userId is None:
             raise credentials_exception
-        TokenData = schemas.TokenData(id= userId)
+        TokenData = schemas.TokenData(id= userId, username= payload.get("username"), admin= payload.get("admin"))
     except InvalidTokenError:
         raise credentials_exception
     return TokenData
 
-def get_current_user(token: str = Depends(oauth2_schema), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(status_code= status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
-    user_id = verify_access_token(token= token, credentials_exception= credentials_exception).id
-    user = db.query(User).filter(User.user_id == user_id).first()
-    return user
\ No newline at end of file
+def credentials_exception():
+    return HTTPException(status_code= status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+
+async def load_user(user_id: int, db: AsyncSession):
+    user = user_cache.get(user_id)
+    if user is None:
+        invalidations = user_cache.invalidations
+        db_user = await db.get(User, user_id)
+        if db_user is None:
+            raise credentials_exception()
+        user = schemas.CurrentUser.model_validate(db_user, from_attributes=True)
+        # A user changed while it was read may have been read as it was before.
+        if user_cache.invalidations == invalidations:
+            user_cache.set(user_id, user)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_schema), db: AsyncSession = Depends(get_db)):
+    user_id = verify_access_token(token= token, credentials_exception= credentials_exception()).id
+    return await load_user(user_id, db)
+
+async def get_current_principal(token: str = Depends(oauth2_schema), db: AsyncSession = Depends(get_db)):
+    """
+    Like `get_current_user`, but in claims mode trusts the username and admin claims of the
+    token instead of looking the user up. Tokens without those claims, and every token once
+    claims mode is turned off, fall back to `get_current_user`.
+    """
+    token_data = verify_access_token(token= token, credentials_exception= credentials_exception())
+    if settings.jwt_claims_mode and token_data.username is not None and token_data.admin is not None:
+        return schemas.CurrentUser(user_id= token_data.id, username= token_data.username, admin= token_data.admin)
+    return await load_user(token_data.id, db)
+
+def invalidate_user(user_id: int):
+    user_cache.pop(user_id)
+
+def raise_for_deleted_user(error: IntegrityError):
+    """
+    Raises 401 when `error` is a write by a user deleted after their token was issued (or
+    cached) failing on a `user_id` foreign key. Other errors are left to the caller.
+    """
+    # asyncpg's error, which SQLAlchemy's DBAPI adapter wraps, names the violated constraint.
+    if getattr(error.orig.__cause__, "constraint_name", None) in USER_FOREIGN_KEYS:
+        raise credentials_exception() from error
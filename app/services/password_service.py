@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.utils import hash_password, verify_password, timed_call
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool, so hashing neither holds the GIL of the
+    API process nor piles up without bound. With `workers` set to 0 bcrypt runs in
+    the threadpool instead.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Forking a process that runs an event loop and threads is unsafe, so workers are spawned.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many password operations in progress, try again later",
+                                headers={"Retry-After": "1"})
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.workers > 0:
+                try:
+                    result, hash_seconds = await asyncio.get_running_loop().run_in_executor(self._get_executor(), timed_call, fn, *args)
+                except BrokenProcessPool:
+                    self._executor = None
+                    raise
+            else:
+                result, hash_seconds = await run_in_threadpool(timed_call, fn, *args)
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.hash_seconds_total += hash_seconds
+        self.hash_seconds_max = max(self.hash_seconds_max, hash_seconds)
+        self.wait_seconds_total += max(time.perf_counter() - start - hash_seconds, 0.0)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_seconds_avg": self.hash_seconds_total / self.completed if self.completed else 0.0,
+            "hash_seconds_max": self.hash_seconds_max,
+            "wait_seconds_avg": self.wait_seconds_total / self.completed if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(workers=settings.password_hash_workers, queue_limit=settings.password_hash_queue_limit)
@@ -0,0 +1,74 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class CheckoutTimingMixin:
+    """
+    Records how long callers wait to check a connection out of the pool,
+    and how many of them gave up after `pool_timeout`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            if waited > self.wait_seconds_max:
+                self.wait_seconds_max = waited
+
+
+class TimedQueuePool(CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(settings) -> dict:
+    """
+    Builds the pool keyword arguments for `create_engine` / `create_async_engine` from the settings.
+    """
+    return {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        "pool_recycle": settings.database_pool_recycle,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+
+
+def pool_status(pool) -> dict:
+    """
+    Returns a snapshot of the pool's connection counts and checkout wait times.
+
+    :param pool: The engine's pool, e.g. `async_engine.pool`.
+    :return: A dictionary matching `schemas.PoolStatus`.
+    """
+    checkouts = getattr(pool, "checkouts", 0)
+    wait_seconds_total = getattr(pool, "wait_seconds_total", 0.0)
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "checkouts": checkouts,
+        "checkout_timeouts": getattr(pool, "checkout_timeouts", 0),
+        "wait_seconds_avg": wait_seconds_total / checkouts if checkouts else 0.0,
+        "wait_seconds_max": getattr(pool, "wait_seconds_max", 0.0),
+    }
@@ -0,0 +1,115 @@
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUERIES_HEADER = b"x-db-queries"
+TIME_HEADER = b"x-db-time"
+
+
+class QueryProfile:
+    """
+    The statements one request ran and the time it spent in the database.
+    """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return f'{self.scope["method"]} {route.path if route is not None else "unmatched"}'
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Turns a statement into its shape, so the same query logs the same line whatever its parameters.
+    """
+    statement = re.sub(r"\s+", " ", statement).strip()
+    statement = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    statement = re.sub(r"(?:\$\d+|%\(\w+\)s|%s)(?:::\w+(?:\[\])?)?|\b\d+(?:\.\d+)?\b", "?", statement)
+    # Expanded IN lists.
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", statement)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    start_times = conn.info.get("query_start_times")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    profile.queries += 1
+    profile.seconds += elapsed
+    if sql_profiler.slow_query_seconds > 0 and elapsed >= sql_profiler.slow_query_seconds:
+        logger.warning("Slow query (%.1f ms) in %s: %s", elapsed * 1000, profile.route, normalize_sql(statement))
+
+
+class SqlProfiler:
+    """
+    Decides which requests are profiled: a `sample_rate` fraction of them, none at 0.
+    """
+
+    def __init__(self, sample_rate: float, slow_query_seconds: float):
+        self.sample_rate = sample_rate
+        self.slow_query_seconds = slow_query_seconds
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling sampled requests. It reports their statement count and
+    database time in `X-DB-Queries` and `X-DB-Time` (milliseconds) response headers, and logs
+    their statements slower than `slow_query_seconds`.
+
+    Headers go out before a streamed body, so they don't count the queries made while streaming.
+    """
+
+    def __init__(self, app, profiler: SqlProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(scope)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (QUERIES_HEADER, str(profile.queries).encode()),
+                    (TIME_HEADER, f"{profile.seconds * 1000:.3f}".encode()),
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_profile.reset(token)
+
+
+sql_profiler = SqlProfiler(settings.sql_profiling_sample_rate, settings.slow_query_seconds)
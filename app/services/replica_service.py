@@ -0,0 +1,83 @@
+import itertools
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.services.cache_service import TTLCache
+from app.services.pool_service import TimedAsyncAdaptedQueuePool, pool_options
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        self.unhealthy_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.unhealthy_until <= time.monotonic()
+
+
+class ReplicaRouter:
+    """
+    Picks the replica that serves a read, or None for the primary.
+
+    Clients that wrote within the last `sticky_seconds` read from the primary, so they
+    see their own writes despite replication lag. They are told apart by their
+    Authorization header. A replica that fails to connect is skipped for `retry_seconds`.
+    """
+
+    def __init__(self, replicas: List[Replica], strategy: str = "round_robin", sticky_seconds: float = 5,
+                 retry_seconds: float = 30, sticky_size: int = 10000):
+        self.replicas = replicas
+        self.strategy = strategy
+        self.retry_seconds = retry_seconds
+        self.recent_writers = TTLCache(maxsize=sticky_size, ttl=sticky_seconds)
+        self._turn = itertools.count()
+
+    def record_write(self, client_key: Optional[str]):
+        if client_key:
+            self.recent_writers.set(client_key, True)
+
+    def choose(self, client_key: Optional[str] = None) -> Optional[Replica]:
+        if client_key and self.recent_writers.get(client_key):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            return min(healthy, key=lambda replica: replica.engine.pool.checkedout())
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_unhealthy(self, replica: Replica):
+        logger.warning("Replica %s is unreachable, reading from the primary for %ss",
+                       replica.engine.url.render_as_string(hide_password=True), self.retry_seconds)
+        replica.unhealthy_until = time.monotonic() + self.retry_seconds
+
+    def status(self) -> List[dict]:
+        return [{
+            "url": replica.engine.url.render_as_string(hide_password=True),
+            "healthy": replica.healthy,
+            "checked_out": replica.engine.pool.checkedout(),
+        } for replica in self.replicas]
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def create_replica_router(settings) -> ReplicaRouter:
+    """
+    Builds the router over the comma separated `database_replica_urls`, each pooled like the primary.
+    """
+    replicas = []
+    for url in filter(None, (url.strip() for url in settings.database_replica_urls.split(","))):
+        url = make_url(url)
+        if url.drivername == "postgresql":
+            url = url.set(drivername="postgresql+asyncpg")
+        replicas.append(Replica(create_async_engine(url, poolclass=TimedAsyncAdaptedQueuePool, **pool_options(settings))))
+    return ReplicaRouter(replicas, settings.database_replica_strategy, settings.read_your_writes_seconds,
+                         settings.database_replica_retry_seconds)
@@ -0,0 +1,211 @@
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, union_all, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.config import settings
+from app.services.cache_service import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """
+    An in-process stand-in for the shared Redis cache (`response_cache_url=memory://`).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._cache.set(key, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.pop(key)
+
+    async def close(self):
+        self._cache.clear()
+
+
+class RedisStore:
+    """
+    A cache shared by every worker, on any server speaking the Redis protocol.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        # Only needed when a redis:// url is configured.
+        import redis.asyncio
+
+        self._redis = redis.asyncio.from_url(url)
+        self._ttl_ms = int(ttl * 1000)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes):
+        if self._ttl_ms > 0:
+            await self._redis.set(key, value, px=self._ttl_ms)
+
+    async def delete(self, *keys: str):
+        await self._redis.delete(*keys)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_store(url: Optional[str], maxsize: int, ttl: float):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryStore(maxsize, ttl)
+    return RedisStore(url, ttl)
+
+
+class ResponseCache:
+    """
+    Serialized responses of single post and comment reads, kept in two levels.
+
+    L1 is a small LRU in this process with a short TTL, because writes handled by other
+    workers can only invalidate L2. L2 is optional and shared. An unreachable L2 is
+    counted and skipped, so reads fall back to the database instead of failing.
+
+    Misses are filled through `filling`, which drops the fill when its key was invalidated
+    while the response was being read, as what was read may predate the write.
+    """
+
+    def __init__(self, l1: TTLCache, l2=None, prefix: str = "blog:"):
+        self.l1 = l1
+        self.l2 = l2
+        self.prefix = prefix
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.l2_errors = 0
+        # While fills are running, the value of `invalidations` when each key was last invalidated.
+        self._invalidated_at = {}
+        self._fills = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self.l1.get(key)
+        if value is not None:
+            self.l1_hits += 1
+            return value
+        if self.l2 is not None:
+            try:
+                value = await self.l2.get(self.prefix + key)
+            except Exception:
+                self.l2_errors += 1
+                logger.exception("Reading %s from the shared response cache failed", key)
+            if value is not None:
+                self.l2_hits += 1
+                self.l1.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: bytes):
+        self.l1.set(key, value)
+        if self.l2 is not None:
+            try:
+                await self.l2.set(self.prefix + key, value)
+            except Exception:
+                self.l2_errors += 1
+                logger.exception("Writing %s to the shared response cache failed", key)
+
+    @asynccontextmanager
+    async def filling(self, key: str):
+        """
+        Yields a function storing the value read for `key`, unless `key` is invalidated first.
+        """
+        started = self.invalidations
+        self._fills += 1
+
+        async def fill(value: bytes):
+            if self._invalidated_at.get(key, 0) <= started:
+                await self.set(key, value)
+
+        try:
+            yield fill
+        finally:
+            self._fills -= 1
+            if not self._fills:
+                self._invalidated_at.clear()
+
+    async def invalidate(self, *keys: str):
+        if not keys:
+            return
+        for key in keys:
+            self.invalidations += 1
+            if self._fills:
+                self._invalidated_at[key] = self.invalidations
+            self.l1.pop(key)
+        if self.l2 is not None:
+            try:
+                await self.l2.delete(*(self.prefix + key for key in keys))
+            except Exception:
+                self.l2_errors += 1
+                logger.exception("Invalidating %s in the shared response cache failed", keys)
+
+    def clear(self):
+        self.l1.clear()
+
+    async def close(self):
+        if self.l2 is not None:
+            await self.l2.close()
+
+    def stats(self) -> dict:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "l1_size": len(self.l1),
+            "l2_enabled": self.l2 is not None,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "l2_errors": self.l2_errors,
+        }
+
+
+def pack_entry(body: bytes, last_modified: datetime) -> bytes:
+    """
+    Stores the `Last-Modified` time of a response in front of its body.
+    """
+    return last_modified.isoformat().encode() + b"\n" + body
+
+def unpack_entry(entry: bytes):
+    last_modified, body = entry.split(b"\n", 1)
+    return body, datetime.fromisoformat(last_modified.decode())
+
+
+def post_key(post_id: int) -> str:
+    return f"post:{post_id}"
+
+def comment_key(comment_id: int) -> str:
+    return f"comment:{comment_id}"
+
+
+response_cache = ResponseCache(
+    TTLCache(settings.response_cache_size, settings.response_cache_l1_ttl_seconds),
+    create_store(settings.response_cache_url, settings.response_cache_size, settings.response_cache_ttl_seconds)
+)
+
+
+async def user_content_keys(db: AsyncSession, user_id: int):
+    """
+    The cache keys of a user's posts and comments, which embed their author's details,
+    and of the comments on their posts, which go when the user is deleted.
+    """
+    rows = await db.execute(union_all(
+        select(literal("post"), models.BlogPost.post_id).filter(models.BlogPost.user_id == user_id),
+        select(literal("comment"), models.Comment.comment_id).filter(models.Comment.user_id == user_id),
+        select(literal("comment"), models.Comment.comment_id).join(models.BlogPost, models.BlogPost.post_id == models.Comment.blog_post_id).filter(models.BlogPost.user_id == user_id)
+    ))
+    return [post_key(id) if kind == "post" else comment_key(id) for kind, id in rows]
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, update, delete, func, literal, union_all, Float
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app import models
+from app.config import settings
+from app.serializers import serialize_post
+
+logger = logging.getLogger(__name__)
+
+# Held by the pod refreshing `post_trending`; the others skip that round.
+REFRESH_LOCK_KEY = 0x7472656e64
+
+
+class TrendingScorer:
+    """
+    How `post_trending` scores posts: each like counts `like_weight` and each comment
+    `comment_weight`, halving every `half_life_seconds`. Because the decay is exponential,
+    a refresh only multiplies the stored scores by the decay since the last refresh and adds
+    the likes and comments made since; nothing is recounted. Scores that decay below
+    `min_score` are dropped, which keeps the table to the posts with recent activity.
+    """
+
+    def __init__(self, half_life_seconds: float, like_weight: float, comment_weight: float, min_score: float):
+        if min_score <= 0:
+            raise ValueError(f"trending_min_score must be positive, not {min_score}")
+        self.decay_rate = math.log(2) / half_life_seconds
+        self.like_weight = like_weight
+        self.comment_weight = comment_weight
+        self.min_score = min_score
+        # Older events would score under `min_score` even alone, so no refresh looks further back.
+        self.horizon = timedelta(seconds=half_life_seconds * math.log2(max(like_weight, comment_weight) / min_score))
+
+    def event_scores(self, since: datetime, now: datetime):
+        likes = select(models.PostsLike.blog_post_id.label("blog_post_id"), literal(self.like_weight, Float).label("weight"), models.PostsLike.created_at).filter(
+            models.PostsLike.created_at > since, models.PostsLike.created_at <= now)
+        comments = select(models.Comment.blog_post_id, literal(self.comment_weight, Float), models.Comment.created_at).filter(
+            models.Comment.created_at > since, models.Comment.created_at <= now)
+        events = union_all(likes, comments).subquery()
+        age = func.extract("epoch", literal(now) - events.c.created_at)
+        return select(events.c.blog_post_id, func.sum(events.c.weight * func.exp(-self.decay_rate * age))).group_by(events.c.blog_post_id)
+
+    def statements(self, refreshed_at: Optional[datetime], now: datetime) -> list:
+        """
+        Builds the statements that bring scores computed at `refreshed_at` up to `now`.
+
+        Stored scores decay over the whole time since `refreshed_at`; only the window of new
+        likes and comments is clamped to the horizon.
+        """
+        since = now - self.horizon if refreshed_at is None else max(refreshed_at, now - self.horizon)
+        added = insert(models.PostTrending).from_select(["blog_post_id", "score"], self.event_scores(since, now))
+        decay_seconds = (now - refreshed_at).total_seconds() if refreshed_at is not None else 0
+        return [
+            update(models.PostTrending).values(
+                score=models.PostTrending.score * math.exp(-self.decay_rate * decay_seconds)
+            ).execution_options(synchronize_session=False),
+            added.on_conflict_do_update(index_elements=["blog_post_id"], set_={"score": models.PostTrending.score + added.excluded.score}),
+            delete(models.PostTrending).filter(models.PostTrending.score < self.min_score).execution_options(synchronize_session=False),
+        ]
+
+
+async def refresh_trending(db: AsyncSession, scorer: TrendingScorer, now: datetime = None) -> Optional[int]:
+    """
+    Brings `post_trending` up to date in one transaction.
+
+    Likes and comments are counted by `created_at`, so one committed after a refresh with a
+    timestamp before it, by a transaction that was still open, is never counted.
+
+    :return: How many posts have a score, or None when another refresh is running.
+    """
+    if not await db.scalar(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_KEY))):
+        await db.rollback()
+        return None
+    if now is None:
+        # Timestamps are stored in the database's clock, so the refresh uses it too.
+        now = await db.scalar(select(func.localtimestamp()))
+    refreshed_at = await db.scalar(select(models.TrendingRefresh.refreshed_at).filter(models.TrendingRefresh.id == 1))
+    if refreshed_at is None or refreshed_at < now:
+        for statement in scorer.statements(refreshed_at, now):
+            await db.execute(statement)
+    await db.execute(insert(models.TrendingRefresh).values(id=1, refreshed_at=now).on_conflict_do_update(
+        index_elements=["id"], set_={"refreshed_at": now}))
+    ranked = await db.scalar(select(func.count()).select_from(models.PostTrending))
+    await db.commit()
+    return ranked
+
+
+class TrendingFeed:
+    """
+    The `size` best scored posts, serialized and held in memory, where `GET /posts/trending`
+    reads them from. The snapshot is reloaded after every refresh, and by the first request
+    that finds it older than `max_staleness_seconds`, so it is never served older than that,
+    even with the refresh loop off. Posts and like counts in it are as of its loading.
+    """
+
+    def __init__(self, size: int, max_staleness_seconds: float):
+        self.size = size
+        self.max_staleness_seconds = max_staleness_seconds
+        self.posts = []
+        self.loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_staleness_seconds
+
+    def query(self):
+        return (select(models.BlogPost).options(joinedload(models.BlogPost.author), models.with_like_count(models.BlogPost))
+                .join(models.PostTrending, models.PostTrending.blog_post_id == models.BlogPost.post_id)
+                .order_by(models.PostTrending.score.desc(), models.BlogPost.post_id.desc()).limit(self.size))
+
+    async def load(self, db: AsyncSession):
+        posts = await db.scalars(self.query())
+        self.posts = [serialize_post(post) for post in posts]
+        self.loaded_at = time.monotonic()
+
+    async def get(self, db: AsyncSession) -> list:
+        if self.stale():
+            # One request reloads; the others wait for it instead of loading too.
+            async with self._lock:
+                if self.stale():
+                    await self.load(db)
+        return self.posts
+
+    def discard(self, post_id: int):
+        self.posts = [post for post in self.posts if post["post_id"] != post_id]
+
+    def clear(self):
+        self.posts = []
+        self.loaded_at = None
+
+
+async def refresh_periodically(session_factory, interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as db:
+                await refresh_trending(db, trending_scorer)
+                await trending_feed.load(db)
+        except Exception:
+            logger.exception("Refreshing trending posts failed")
+
+
+trending_scorer = TrendingScorer(settings.trending_half_life_hours * 3600, settings.trending_like_weight,
+                                 settings.trending_comment_weight, settings.trending_min_score)
+trending_feed = TrendingFeed(settings.trending_size, settings.trending_max_staleness_seconds)
@@ -1,3 +1,4 @@
+import time
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
@@ -9,6 +10,15 @@ def hash_password(password: str):
 def verify_password(plain_password:str, hashedpassword: str):
     return pwd_context.verify(plain_password, hashedpassword)
 
+def timed_call(fn, *args):
+    """
+    Calls `fn` with `args` and returns its result with the seconds it took.
+    Used by the password hashing workers, so it must stay importable without the app settings.
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
 def remove_attribute(model: BaseModel, attribute: str):
     """
     Removes the specified attribute from the Pydantic model (if it exists) 
@@ -0,0 +1,56 @@
+"""
+Compares two result files written by `benchmarks.run`.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+
+
+def change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(old: dict, new: dict) -> list:
+    """
+    One row per scenario and concurrency level measured in both reports.
+    """
+    old_results = {(result["scenario"], result["concurrency"]): result for result in old["results"]}
+    rows = []
+    for result in new["results"]:
+        before = old_results.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        rows.append({
+            "scenario": result["scenario"],
+            "concurrency": result["concurrency"],
+            "rps": change(before["rps"], result["rps"]),
+            "p50_ms": change(before["p50_ms"], result["p50_ms"]),
+            "p95_ms": change(before["p95_ms"], result["p95_ms"]),
+            "p99_ms": change(before["p99_ms"], result["p99_ms"]),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'scenario':>14} {'c':>4} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for row in compare(old, new):
+        print(f"{row['scenario']:>14} {row['concurrency']:>4} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
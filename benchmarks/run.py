@@ -0,0 +1,262 @@
+"""
+Load benchmark of the API's hot endpoints.
+
+Seeds a dataset (optional, it empties the configured database first), then drives each
+scenario at each concurrency level for a fixed duration and reports requests per second
+and p50/p95/p99 latencies. Results are saved as JSON named after the current commit, so
+two commits can be compared with `python -m benchmarks.compare old.json new.json`.
+
+Usage:
+    python -m benchmarks.run --seed --database blogDB_bench --users 1000 --posts 10000 --comments 50000 --likes 100000
+    python -m benchmarks.run --concurrency 1,16,64 --duration 15
+    python -m benchmarks.run --base-url http://127.0.0.1:8000 --scenarios get_post,list_posts
+
+Without `--base-url` the app is driven in process, which measures the application and
+the database without a network or server in between. Point the app at a dedicated
+database (DATABASE_NAME) before seeding, and name it with `--database` to confirm, or
+pass `--yes`.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+import httpx
+from sqlalchemy import text, func, select
+
+BENCHMARK_PASSWORD = "benchmark-password"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def seed(connection, users: int, posts: int, comments: int, likes: int, batch_size: int = 10000, log=print):
+    """
+    Empties the database and fills it with uniformly random users, posts, comments and post likes.
+    """
+    from app.commands.bulk_import import import_rows
+    from app.utils import hash_password
+
+    rng = random.Random(42)
+    # Every benchmark user shares one precomputed hash, so seeding doesn't pay bcrypt per user.
+    password_hash = hash_password(BENCHMARK_PASSWORD)
+
+    with connection.begin():
+        connection.execute(text("TRUNCATE users RESTART IDENTITY CASCADE"))
+
+    import_rows(connection, "users", ({
+        "user_id": i, "username": f"bench{i}", "first_name": "Bench", "last_name": f"User{i}",
+        "email": f"bench{i}@example.com", "password_hash": password_hash,
+    } for i in range(1, users + 1)), batch_size)
+    import_rows(connection, "posts", ({
+        "post_id": i, "user_id": rng.randint(1, users), "title": f"Benchmark post {i}",
+        "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 5,
+    } for i in range(1, posts + 1)), batch_size)
+    import_rows(connection, "comments", ({
+        "comment_id": i, "user_id": rng.randint(1, users), "blog_post_id": rng.randint(1, posts), "content": f"Comment {i}",
+    } for i in range(1, comments + 1)), batch_size)
+    # Duplicate pairs are skipped by the import, so slightly fewer likes may land.
+    import_rows(connection, "post_likes", ({
+        "user_id": rng.randint(1, users), "blog_post_id": rng.randint(1, posts),
+    } for _ in range(likes)), batch_size)
+    with connection.begin():
+        connection.execute(text("ANALYZE"))
+    log(f"Seeded {users} users, {posts} posts, {comments} comments and about {likes} likes")
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """
+    The nearest-rank percentile of already sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    # Rounded first so that 0.99 * 100 ranks 99, not 100.
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    index = min(len(sorted_values) - 1, max(0, rank - 1))
+    return sorted_values[index]
+
+
+def summarize(scenario: str, concurrency: int, latencies, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+class Dataset:
+    """
+    The id ranges to draw requests from, read from the database.
+    """
+
+    def __init__(self, connection):
+        from app import models
+
+        self.user_ids = connection.execute(select(models.User.user_id).filter(models.User.username.like("bench%"))).scalars().all()
+        self.max_post_id = connection.scalar(select(func.max(models.BlogPost.post_id))) or 0
+        if not self.user_ids or not self.max_post_id:
+            raise SystemExit("No benchmark data found, run with --seed first")
+        self.tokens = {}
+
+    def token(self, user_id: int) -> str:
+        from app.services.oauth2_service import create_jwt_token
+
+        if user_id not in self.tokens:
+            self.tokens[user_id] = create_jwt_token(data={"user_id": user_id}, expire_minutes=24 * 60)
+        return self.tokens[user_id]
+
+    def auth(self, rng) -> dict:
+        return {"Authorization": f"Bearer {self.token(rng.choice(self.user_ids))}"}
+
+    def post_id(self, rng) -> int:
+        return rng.randint(1, self.max_post_id)
+
+
+async def login(client, data: Dataset, rng):
+    user_id = rng.choice(data.user_ids)
+    return [await client.post("/login/", data={"username": f"bench{user_id}", "password": BENCHMARK_PASSWORD})]
+
+async def list_posts(client, data: Dataset, rng):
+    return [await client.get("/posts/", params={"limit": 10, "skip": rng.randint(0, 100)})]
+
+async def get_post(client, data: Dataset, rng):
+    return [await client.get(f"/posts/{data.post_id(rng)}")]
+
+async def list_comments(client, data: Dataset, rng):
+    return [await client.get(f"/comments/posts/{data.post_id(rng)}", params={"limit": 10})]
+
+async def like_unlike(client, data: Dataset, rng):
+    headers = data.auth(rng)
+    post_id = data.post_id(rng)
+    liked = await client.post(f"/likes/posts/{post_id}", headers=headers)
+    # The pair may already have been liked while seeding.
+    if liked.status_code == 409:
+        return [await client.delete(f"/likes/posts/{post_id}", headers=headers)]
+    return [liked, await client.delete(f"/likes/posts/{post_id}", headers=headers)]
+
+SCENARIOS = {
+    "login": login,
+    "list_posts": list_posts,
+    "get_post": get_post,
+    "list_comments": list_comments,
+    "like_unlike": like_unlike,
+}
+
+
+async def drive(client, scenario: str, data: Dataset, concurrency: int, duration: float, seed: int = 0) -> dict:
+    """
+    Runs `concurrency` clients in a loop on one scenario for `duration` seconds.
+    Every response is one latency sample, so a like/unlike round gives two.
+    """
+    run = SCENARIOS[scenario]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(rng):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            for response in await run(client, data, rng):
+                latencies.append(response.elapsed.total_seconds())
+                # Paths are the canonical ones, so redirects are errors too.
+                if response.status_code >= 300:
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed * 1000 + i)) for i in range(concurrency)))
+    return summarize(scenario, concurrency, latencies, errors, time.perf_counter() - start)
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def benchmark(args, data: Dataset) -> list:
+    if args.base_url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=max(args.concurrency)))
+        base_url = args.base_url
+    else:
+        from app.main import blogApp
+
+        transport = httpx.ASGITransport(app=blogApp)
+        base_url = "http://benchmark"
+
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                if args.warmup:
+                    await drive(client, scenario, data, concurrency, args.warmup)
+                result = await drive(client, scenario, data, concurrency, args.duration, seed=concurrency)
+                print(f"{scenario:>14} c={concurrency:<4} {result['rps']:9.1f} rps  p50 {result['p50_ms']:8.2f} ms  "
+                      f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  errors {result['errors']}")
+                results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the blogging platform API.")
+    parser.add_argument("--seed", action="store_true", help="Empty the database and seed it first")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario and concurrency level")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each run")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the app in process")
+    parser.add_argument("--output", help="Results file, by default benchmarks/results/<commit>.json")
+    parser.add_argument("--database", help="The configured database, named to confirm --seed may empty it")
+    parser.add_argument("--yes", action="store_true", help="Let --seed empty the configured database without naming it")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from app.config import settings
+    if args.seed and not args.yes and args.database != settings.database_name:
+        parser.error(f"--seed empties {settings.database_name}; pass --database {settings.database_name} or --yes to go ahead")
+
+    from app.database import engine
+
+    with engine.connect() as connection:
+        if args.seed:
+            seed(connection, args.users, args.posts, args.comments, args.likes)
+        data = Dataset(connection)
+
+    results = asyncio.run(benchmark(args, data))
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "target": args.base_url or "in-process",
+        "duration": args.duration,
+        "dataset": {"users": len(data.user_ids), "posts": data.max_post_id},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from fastapi.testclient import TestClient
 from app.main import blogApp
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from app.database import Base, get_db, get_read_db
 from app.config import settings
-from app.services.oauth2_service import create_jwt_token
+from app.services.oauth2_service import create_jwt_token, user_cache
+from app.services.response_cache_service import response_cache
+from app.services.trending_service import trending_feed
 from app import schemas
 import pytest
 
@@ -14,6 +18,13 @@ engine = create_engine(SQLALCHEMY_TESTING_DATABASE_URL)
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+SQLALCHEMY_ASYNC_TESTING_DATABASE_URL = f'postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}_test'
+
+# asyncpg connections belong to the event loop that opened them, so nothing is pooled across tests.
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_TESTING_DATABASE_URL, poolclass=NullPool)
+
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 @pytest.fixture(scope = "function")
 def session():
@@ -27,14 +38,27 @@ def session():
 
 @pytest.fixture(scope = "function")
 def client(session):
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
     blogApp.dependency_overrides[get_db] = override_get_db
-    yield TestClient(blogApp)
+    blogApp.dependency_overrides[get_read_db] = override_get_db
+    # The database is rebuilt for every test, so user ids are reused.
+    user_cache.clear()
+    response_cache.clear()
+    trending_feed.clear()
+    with TestClient(blogApp) as client:
+        yield client
     
+@pytest.fixture
+def query_counter(client):
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
 @pytest.fixture
 def test_user(client):
     user_data = {
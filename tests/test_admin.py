@@ -0,0 +1,32 @@
+def test_admin_pool_status(admin_client):
+    res = admin_client.get("/admin/pool")
+    assert res.status_code == 200
+    pool = res.json()
+    assert pool["pool_size"] >= 1
+    assert pool["checked_out"] >= 0
+    assert pool["idle"] >= 0
+
+def test_non_admin_pool_status(authorized_client):
+    res = authorized_client.get("/admin/pool")
+    assert res.status_code == 403
+
+def test_admin_password_hashing_status(admin_client):
+    res = admin_client.get("/admin/password-hashing")
+    assert res.status_code == 200
+    hashing = res.json()
+    # Creating the admin user hashed its password.
+    assert hashing["completed"] >= 1
+    assert hashing["hash_seconds_max"] > 0
+
+def test_admin_response_cache_status(admin_client):
+    post_id = admin_client.post("/posts/", json={"title": "Cached", "content": "Post"}).json()["post_id"]
+    before = admin_client.get("/admin/response-cache").json()
+    admin_client.get(f"/posts/{post_id}")
+    admin_client.get(f"/posts/{post_id}")
+
+    res = admin_client.get("/admin/response-cache")
+    assert res.status_code == 200
+    cache = res.json()
+    assert cache["misses"] == before["misses"] + 1
+    assert cache["l1_hits"] == before["l1_hits"] + 1
+    assert cache["l1_size"] >= 1
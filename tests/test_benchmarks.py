@@ -0,0 +1,22 @@
+import pytest
+from benchmarks.run import percentile, summarize, main
+from benchmarks.compare import compare
+
+
+def test_percentile():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 0.50) == 0.050
+    assert percentile(values, 0.99) == 0.099
+    assert percentile([], 0.5) == 0.0
+
+def test_summarize_and_compare():
+    old = summarize("get_post", 8, [0.002] * 100, 0, 1.0)
+    assert old["rps"] == 100
+    assert old["p95_ms"] == 2.0
+    new = summarize("get_post", 8, [0.001] * 200, 0, 1.0)
+    rows = compare({"results": [old]}, {"results": [new]})
+    assert rows == [{"scenario": "get_post", "concurrency": 8, "rps": "+100.0%", "p50_ms": "-50.0%", "p95_ms": "-50.0%", "p99_ms": "-50.0%"}]
+
+def test_seed_needs_confirmation():
+    with pytest.raises(SystemExit):
+        main(["--seed", "--database", "some_other_database"])
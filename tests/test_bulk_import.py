@@ -0,0 +1,63 @@
+import pytest
+import io
+from sqlalchemy import select
+from app import models
+from app.utils import verify_password
+from app.commands.bulk_import import import_rows, read_rows
+from .conftest import engine
+
+
+def test_bulk_import(session):
+    users = io.StringIO(
+        '{"user_id": 10, "username": "bulk1", "first_name": "Bulk", "last_name": "One", "email": "bulk1@example.com", "password": "secret1", "phone": "1", "birthdate": "1990-01-01"}\n'
+        '{"user_id": 11, "username": "bulk2", "first_name": "Bulk", "last_name": "Two", "email": "bulk2@example.com", "password": "secret2", "phone": null, "birthdate": "1990-01-01", "admin": true}\n'
+    )
+    posts = io.StringIO("post_id,user_id,title,content\n20,10,First,Hello\n21,11,Second,\"Comma, \"\"quoted\"\"\"\n")
+    likes = io.StringIO('{"user_id": 10, "blog_post_id": 20}\n{"user_id": 11, "blog_post_id": 20}\n{"user_id": 11, "blog_post_id": 20}\n')
+
+    with engine.connect() as connection:
+        assert import_rows(connection, "users", read_rows(users, "ndjson"), batch_size=1, hash_workers=2) == {"read": 2, "inserted": 2}
+        assert import_rows(connection, "posts", read_rows(posts, "csv")) == {"read": 2, "inserted": 2}
+        assert import_rows(connection, "post_likes", read_rows(likes, "ndjson")) == {"read": 3, "inserted": 2}
+
+    user = session.scalar(select(models.User).filter(models.User.username == "bulk2"))
+    assert user.admin
+    assert user.phone is None
+    assert verify_password("secret2", user.password)
+    post = session.get(models.BlogPost, 21)
+    assert post.content == 'Comma, "quoted"'
+    assert session.get(models.BlogPost, 20).like_count == 2
+    assert post.like_count == 0
+
+    # The sequences were moved past the imported ids.
+    new_post = models.BlogPost(user_id=10, title="After", content="import")
+    session.add(new_post)
+    session.commit()
+    assert new_post.post_id == 22
+
+def test_bulk_import_missing_values(session):
+    # Blank optional CSV fields, and NDJSON rows that don't all have the same keys.
+    users_csv = io.StringIO("username,first_name,last_name,email,password,phone,birthdate,admin\ncsv1,Csv,One,csv1@example.com,secret,,,\n")
+    users_ndjson = io.StringIO(
+        '{"username": "json1", "first_name": "Json", "last_name": "One", "email": "json1@example.com", "password": "secret"}\n'
+        '{"username": "json2", "first_name": "Json", "last_name": "Two", "email": "json2@example.com", "password": "secret", "phone": "+201001234567", "admin": true}\n'
+    )
+    with engine.connect() as connection:
+        assert import_rows(connection, "users", read_rows(users_csv, "csv")) == {"read": 1, "inserted": 1}
+        assert import_rows(connection, "users", read_rows(users_ndjson, "ndjson")) == {"read": 2, "inserted": 2}
+
+    csv_user = session.scalar(select(models.User).filter(models.User.username == "csv1"))
+    assert csv_user.phone is None and csv_user.birthdate is None and csv_user.admin is False
+    json_user = session.scalar(select(models.User).filter(models.User.username == "json2"))
+    assert json_user.phone == "+201001234567"
+    assert json_user.admin
+
+def test_bulk_import_user_without_password(session):
+    users = io.StringIO(
+        '{"username": "ok", "first_name": "O", "last_name": "K", "email": "ok@example.com", "password": "secret"}\n'
+        '\n'
+        '{"username": "nopass", "first_name": "No", "last_name": "Pass", "email": "nopass@example.com"}\n'
+    )
+    with engine.connect() as connection:
+        with pytest.raises(ValueError, match="Line 3"):
+            import_rows(connection, "users", read_rows(users, "ndjson"))
@@ -0,0 +1,111 @@
+from app import schemas, models
+import pytest
+
+@pytest.fixture()
+def test_comments(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    comments_responses = []
+    for content in ["Comment 1 Content", "Comment 2 Content", "Comment 3 Content"]:
+        res = authorized_client.post(f"/comments/posts/{post_id}", json={"content": content})
+        assert res.status_code == 201
+        comments_responses.append(res.json())
+    return comments_responses
+
+def test_create_comment(authorized_client, test_user, test_posts):
+    post_id = test_posts[0]["post_id"]
+    res = authorized_client.post(f"/comments/posts/{post_id}", json={"content": "New comment"})
+    created_comment = schemas.CommentReturn(**res.json())
+
+    assert res.status_code == 201
+    assert created_comment.content == "New comment"
+    assert created_comment.blog_post_id == post_id
+    assert created_comment.author.username == test_user["username"]
+
+def test_create_comment_on_nonexistent_post(authorized_client):
+    res = authorized_client.post("/comments/posts/9999", json={"content": "New comment"})
+    assert res.status_code == 404
+
+def test_get_comments_of_post(authorized_client, test_comments):
+    post_id = test_comments[0]["blog_post_id"]
+    res = authorized_client.get(f"/comments/posts/{post_id}")
+
+    assert res.status_code == 200
+    comments = [schemas.CommentReturn(**comment) for comment in res.json()]
+    assert [comment.comment_id for comment in comments] == [comment["comment_id"] for comment in test_comments]
+
+def test_get_single_comment(authorized_client, test_comments):
+    comment_id = test_comments[1]["comment_id"]
+    res = authorized_client.get(f"/comments/{comment_id}")
+
+    assert res.status_code == 200
+    assert res.json()["content"] == test_comments[1]["content"]
+
+def test_update_comment(authorized_client, test_comments):
+    comment_id = test_comments[0]["comment_id"]
+    res = authorized_client.put(f"/comments/{comment_id}", json={"content": "Updated Content"})
+
+    assert res.status_code == 200
+    assert schemas.CommentReturn(**res.json()).content == "Updated Content"
+
+def test_other_user_update_comment(client, test_comments, token2):
+    comment_id = test_comments[0]["comment_id"]
+    res = client.put(f"/comments/{comment_id}", json={"content": "Updated Content"},
+                     headers={"Authorization": f"{token2.token_type} {token2.access_token}"})
+    assert res.status_code == 403
+
+def test_delete_comment(authorized_client, test_comments):
+    comment_id = test_comments[0]["comment_id"]
+    res = authorized_client.delete(f"/comments/{comment_id}")
+    assert res.status_code == 204
+
+    res = authorized_client.get(f"/comments/{comment_id}")
+    assert res.status_code == 404
+
+@pytest.mark.parametrize("page_size", [1, 5, 20])
+def test_get_comments_query_count(client, session, test_user, test_posts, query_counter, page_size):
+    post_id = test_posts[0]["post_id"]
+    session.add_all([models.Comment(content=f"Comment {i}", blog_post_id=post_id, user_id=test_user['user_id']) for i in range(20)])
+    session.commit()
+    query_counter.clear()
+
+    res = client.get(f"/comments/posts/{post_id}?limit={page_size}")
+
+    assert res.status_code == 200
+    assert len(res.json()) == page_size
+    # One query checks the post exists, one loads the page with its authors.
+    assert len(query_counter) == 2
+
+def test_comments_cursor_pagination(authorized_client, test_comments):
+    post_id = test_comments[0]["blog_post_id"]
+    res = authorized_client.get(f"/comments/posts/{post_id}?limit=2")
+    assert [comment["comment_id"] for comment in res.json()] == [comment["comment_id"] for comment in test_comments[:2]]
+
+    res = authorized_client.get(f"/comments/posts/{post_id}?limit=2&cursor={res.headers['X-Next-Cursor']}")
+    assert [comment["comment_id"] for comment in res.json()] == [test_comments[2]["comment_id"]]
+    assert "X-Next-Cursor" not in res.headers
+
+def test_get_one_comment_cached_and_invalidated(authorized_client, test_posts, query_counter):
+    comment = authorized_client.post(f"/comments/posts/{test_posts[0]['post_id']}", json={"content": "Cached"}).json()
+    authorized_client.get(f"/comments/{comment['comment_id']}")
+    query_counter.clear()
+    assert authorized_client.get(f"/comments/{comment['comment_id']}").json()["content"] == "Cached"
+    assert query_counter == []
+
+    authorized_client.put(f"/comments/{comment['comment_id']}", json={"content": "Edited"})
+    assert authorized_client.get(f"/comments/{comment['comment_id']}").json()["content"] == "Edited"
+
+    # Deleting the post takes its comments with it.
+    authorized_client.delete(f"/posts/{test_posts[0]['post_id']}")
+    assert authorized_client.get(f"/comments/{comment['comment_id']}").status_code == 404
+
+def test_get_comments_not_modified(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    comment = authorized_client.post(f"/comments/posts/{post_id}", json={"content": "First"}).json()
+    etag = authorized_client.get(f"/comments/posts/{post_id}").headers["ETag"]
+    assert authorized_client.get(f"/comments/posts/{post_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    authorized_client.post(f"/comments/posts/{post_id}", json={"content": "Second"})
+    assert authorized_client.get(f"/comments/posts/{post_id}", headers={"If-None-Match": etag}).status_code == 200
+
+    etag = authorized_client.get(f"/comments/{comment['comment_id']}").headers["ETag"]
+    assert authorized_client.get(f"/comments/{comment['comment_id']}", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,73 @@
+import gzip
+from app.services.compression_service import GzipCodec, negotiate, parse_accept_encoding, decoded_if_none_match
+
+
+class FakeCodec:
+    def __init__(self, name):
+        self.name = name
+
+codecs = [FakeCodec("br"), FakeCodec("zstd"), FakeCodec("gzip")]
+
+
+def test_negotiate():
+    assert parse_accept_encoding("gzip;q=0.5, BR , identity;q=0") == {"gzip": 0.5, "br": 1.0, "identity": 0.0}
+    assert negotiate("gzip, deflate, br", codecs).name == "br"
+    assert negotiate("gzip;q=1, br;q=0.5", codecs).name == "gzip"
+    assert negotiate("*;q=0.1, br;q=0", codecs).name == "zstd"
+    assert negotiate("identity", codecs) is None
+    assert negotiate("gzip;q=0", codecs) is None
+
+def test_decoded_if_none_match():
+    assert decoded_if_none_match('"abc-gzip", W/"def", "ghi-br"', codecs) == '"abc", W/"def", "ghi"'
+
+def test_gzip_stream_round_trip():
+    stream = GzipCodec(6).stream()
+    chunks = [b'{"row": 1}\n' * 100, b'{"row": 2}\n' * 100]
+    assert gzip.decompress(b"".join(stream.chunk(chunk) for chunk in chunks) + stream.finish()) == b"".join(chunks)
+
+def test_large_response_is_compressed(client, authorized_client):
+    for i in range(20):
+        authorized_client.post("/posts/", json={"title": f"Post {i}", "content": "Lorem ipsum dolor sit amet. " * 50})
+
+    res = client.get("/posts/?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.headers["vary"] == "Accept-Encoding"
+    assert int(res.headers["content-length"]) < len(res.content) / 5
+    assert len(res.json()) == 20
+    etag = res.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    # The compressed representation's ETag validates it, and comes back as is.
+    res = client.get("/posts/?limit=20", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["etag"] == etag
+
+    res = client.get("/posts/?limit=20", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in res.headers
+    assert res.headers["etag"] == etag.replace('-gzip"', '"')
+
+    samples = dict(line.rsplit(" ", 1) for line in client.get("/metrics").text.splitlines() if not line.startswith("#"))
+    assert int(samples['http_response_compression_saved_bytes_total{encoding="gzip"}']) > 0
+
+def test_small_response_is_not_compressed(client, test_posts):
+    res = client.get(f"/posts/{test_posts[0]['post_id']}", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert "content-encoding" not in res.headers
+    assert not res.headers["etag"].endswith('-gzip"')
+
+def test_streamed_response_is_compressed(admin_client, test_user2):
+    res = admin_client.get("/users?format=ndjson", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert "content-length" not in res.headers
+    assert len(res.text.splitlines()) == 3
+
+def test_compressed_conditional_request_keeps_route_label(client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    etag = client.get(f"/posts/{post_id}").headers["etag"]
+    res = client.get(f"/posts/{post_id}", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert res.status_code == 304
+
+    samples = dict(line.rsplit(" ", 1) for line in client.get("/metrics").text.splitlines() if not line.startswith("#"))
+    assert int(samples['http_requests_total{method="GET",route="/posts/{id}",status="304"}']) >= 1
@@ -0,0 +1,59 @@
+import pytest
+import random
+from datetime import datetime
+from sqlalchemy import select, func
+from app import models
+from app.commands.generate_dataset import DatasetGenerator, zipf_counts, main
+from app.utils import verify_password
+from .conftest import engine
+
+
+def test_zipf_counts():
+    counts = zipf_counts(1000, 100, 1.0, 50, random.Random(1))
+    assert sum(counts) == 1000
+    assert max(counts) == 50
+    # Most items are cold.
+    assert sorted(counts)[50] < 10
+
+def test_zipf_counts_of_nothing():
+    assert zipf_counts(0, 0, 1.0, 50, random.Random(1)) == []
+    assert zipf_counts(0, 3, 1.0, 50, random.Random(1)) == [0, 0, 0]
+
+def test_generate_dataset(session):
+    session.add(models.TrendingRefresh(id=1, refreshed_at=datetime.now()))
+    session.commit()
+    generator = DatasetGenerator(users=20, posts=30, comments=60, post_likes=200, comment_likes=50)
+    with engine.connect() as connection:
+        loaded = generator.generate(connection, batch_size=25)
+    assert loaded == {"users": 20, "posts": 30, "comments": 60, "post_likes": 200, "comment_likes": 50}
+
+    likes_per_post = dict(session.execute(select(models.PostsLike.blog_post_id, func.count()).group_by(models.PostsLike.blog_post_id)).all())
+    for post in session.scalars(select(models.BlogPost)):
+        assert post.like_count == likes_per_post.get(post.post_id, 0)
+    likes_per_comment = dict(session.execute(select(models.CommentsLike.comment_id, func.count()).group_by(models.CommentsLike.comment_id)).all())
+    for comment in session.scalars(select(models.Comment)):
+        assert comment.like_count == likes_per_comment.get(comment.comment_id, 0)
+
+    # Comments and likes come after what they belong to.
+    assert not session.scalar(select(func.count()).select_from(models.Comment).join(models.BlogPost).filter(
+        models.Comment.created_at < models.BlogPost.created_at))
+    assert not session.scalar(select(func.count()).select_from(models.PostsLike).join(models.BlogPost).filter(
+        models.PostsLike.created_at < models.BlogPost.created_at))
+    assert not session.scalar(select(func.count()).select_from(models.CommentsLike).join(models.Comment).filter(
+        models.CommentsLike.created_at < models.Comment.created_at))
+
+    # The trending scores of the old data go with it.
+    assert session.scalar(select(func.count()).select_from(models.TrendingRefresh)) == 0
+
+    user = session.get(models.User, 1)
+    assert verify_password("password123", user.password)
+
+    # Sequences continue after the generated ids.
+    post = models.BlogPost(user_id=1, title="New", content="Post")
+    session.add(post)
+    session.commit()
+    assert post.post_id == 31
+
+def test_generate_dataset_needs_confirmation():
+    with pytest.raises(SystemExit):
+        main(["--database", "some_other_database"])
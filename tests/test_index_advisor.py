@@ -0,0 +1,18 @@
+from app.commands.index_advisor import advise, unindexed_scans
+from .conftest import engine
+
+
+def test_unindexed_scans():
+    plan = {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "comments"},
+        {"Node Type": "Index Scan", "Relation Name": "blog_posts", "Index Name": "blog_posts_pkey", "Index Cond": "(post_id = 1)"},
+        {"Node Type": "Index Scan", "Relation Name": "users", "Index Name": "users_pkey", "Filter": "(admin)"},
+    ]}
+    assert unindexed_scans(plan) == ["comments", "users (whole users_pkey)"]
+    # Under a LIMIT, walking an index in order and filtering stops early.
+    assert unindexed_scans({"Node Type": "Limit", "Plans": [plan["Plans"][2]]}) == []
+
+def test_every_query_shape_uses_an_index(session, test_posts):
+    with engine.connect() as connection:
+        report = advise(connection)
+    assert {name: scans for name, (scans, _) in report.items() if scans} == {}
@@ -0,0 +1,168 @@
+import asyncio
+import httpx
+from app import models
+from app.main import blogApp
+from app.config import settings
+from app.routers.post import select_posts
+from app.services.oauth2_service import create_jwt_token
+import pytest
+
+@pytest.fixture()
+def test_comment(authorized_client, test_posts):
+    res = authorized_client.post(f"/comments/posts/{test_posts[0]['post_id']}", json={"content": "Comment Content"})
+    assert res.status_code == 201
+    return res.json()
+
+def test_like_post(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    res = authorized_client.post(f"/likes/posts/{post_id}")
+
+    assert res.status_code == 201
+    assert res.json()["like_count"] == 1
+    assert authorized_client.get(f"/posts/{post_id}").json()["like_count"] == 1
+
+def test_like_post_twice(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    authorized_client.post(f"/likes/posts/{post_id}")
+    res = authorized_client.post(f"/likes/posts/{post_id}")
+    assert res.status_code == 409
+
+def test_like_nonexistent_post(authorized_client):
+    res = authorized_client.post("/likes/posts/9999")
+    assert res.status_code == 404
+
+def test_unlike_post(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    authorized_client.post(f"/likes/posts/{post_id}")
+    res = authorized_client.delete(f"/likes/posts/{post_id}")
+
+    assert res.status_code == 200
+    assert res.json()["like_count"] == 0
+
+def test_unlike_post_not_liked(authorized_client, test_posts):
+    res = authorized_client.delete(f"/likes/posts/{test_posts[0]['post_id']}")
+    assert res.status_code == 404
+
+def test_like_and_unlike_comment(authorized_client, test_comment):
+    comment_id = test_comment["comment_id"]
+    res = authorized_client.post(f"/likes/comments/{comment_id}")
+    assert res.status_code == 201
+    assert res.json()["like_count"] == 1
+
+    res = authorized_client.post(f"/likes/comments/{comment_id}")
+    assert res.status_code == 409
+
+    res = authorized_client.delete(f"/likes/comments/{comment_id}")
+    assert res.status_code == 200
+    assert res.json()["like_count"] == 0
+
+def test_users_who_liked_post(authorized_client, test_user, test_posts):
+    post_id = test_posts[0]["post_id"]
+    authorized_client.post(f"/likes/posts/{post_id}")
+    res = authorized_client.get(f"/likes/posts/{post_id}/users")
+
+    assert res.status_code == 200
+    assert [user["username"] for user in res.json()] == [test_user["username"]]
+
+def test_users_who_liked_comment(authorized_client, test_user, test_comment):
+    comment_id = test_comment["comment_id"]
+    authorized_client.post(f"/likes/comments/{comment_id}")
+    res = authorized_client.get(f"/likes/comments/{comment_id}/users")
+
+    assert res.status_code == 200
+    assert [user["username"] for user in res.json()] == [test_user["username"]]
+
+def test_users_who_liked_post_cursor_pagination(client, test_posts, token, token2):
+    post_id = test_posts[0]["post_id"]
+    client.post(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token.access_token}"})
+    client.post(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token2.access_token}"})
+
+    res = client.get(f"/likes/posts/{post_id}/users?limit=1")
+    assert [user["username"] for user in res.json()] == ["maher"]
+
+    res = client.get(f"/likes/posts/{post_id}/users?limit=1&cursor={res.headers['X-Next-Cursor']}")
+    assert [user["username"] for user in res.json()] == ["maher2"]
+
+def like_concurrently(session, post_id, likers):
+    users = [models.User(username=f"liker{i}", first_name="Liker", last_name=f"{i}", email=f"liker{i}@example.com", password="not-a-hash") for i in range(likers)]
+    session.add_all(users)
+    session.commit()
+    tokens = [create_jwt_token(data={"user_id": user.user_id}) for user in users]
+
+    async def like_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=blogApp), base_url="http://test") as async_client:
+            return await asyncio.gather(*[
+                async_client.post(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token}"}) for token in tokens
+            ])
+
+    return asyncio.run(like_all())
+
+def test_concurrent_likes_are_all_counted(client, session, test_posts):
+    post_id = test_posts[0]["post_id"]
+    responses = like_concurrently(session, post_id, 20)
+
+    assert all(res.status_code == 201 for res in responses)
+    assert sorted(res.json()["like_count"] for res in responses) == list(range(1, 21))
+    assert client.get(f"/posts/{post_id}").json()["like_count"] == 20
+
+def test_sharded_like_counters(client, session, test_posts, token, token2, admin_user, monkeypatch):
+    monkeypatch.setattr(settings, "like_counter_shards", 4)
+    post_id = test_posts[0]["post_id"]
+
+    res = client.post(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token.access_token}"})
+    assert res.json()["like_count"] == 1
+    res = client.post(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token2.access_token}"})
+    assert res.json()["like_count"] == 2
+    res = client.delete(f"/likes/posts/{post_id}", headers={"Authorization": f"bearer {token.access_token}"})
+    assert res.json()["like_count"] == 1
+
+    # The likes are still in the shards, not in the post row, but reads add them up.
+    assert session.get(models.BlogPost, post_id).stored_like_count == 0
+    assert client.get(f"/posts/{post_id}").json()["like_count"] == 1
+
+    admin_token = create_jwt_token(data={"user_id": admin_user['user_id']})
+    res = client.post("/admin/like-counters/compact", headers={"Authorization": f"bearer {admin_token}"})
+    assert res.json() == {"posts": 1, "comments": 0}
+
+    session.expire_all()
+    assert session.get(models.BlogPost, post_id).stored_like_count == 1
+    assert session.query(models.PostLikeShard).count() == 0
+    assert client.get(f"/posts/{post_id}").json()["like_count"] == 1
+
+def test_unsharded_reads_skip_the_shards(monkeypatch):
+    monkeypatch.setattr(settings, "like_counter_shards", 0)
+    assert "like_shards" not in str(select_posts())
+    monkeypatch.setattr(settings, "like_counter_shards", 4)
+    assert "post_like_shards" in str(select_posts())
+
+def test_concurrent_sharded_likes_are_all_counted(client, session, test_posts, monkeypatch):
+    monkeypatch.setattr(settings, "like_counter_shards", 4)
+    post_id = test_posts[0]["post_id"]
+    responses = like_concurrently(session, post_id, 20)
+
+    # Each response counts the likes it could see, but none of them is lost in the total.
+    assert all(res.status_code == 201 for res in responses)
+    assert client.get(f"/posts/{post_id}").json()["like_count"] == 20
+
+def test_liked_posts_lookup(authorized_client, test_posts, query_counter):
+    post_ids = [post["post_id"] for post in test_posts]
+    authorized_client.post(f"/likes/posts/{post_ids[0]}")
+    authorized_client.post(f"/likes/posts/{post_ids[2]}")
+    query_counter.clear()
+
+    res = authorized_client.get("/likes/posts", params={"ids": post_ids + [9999]})
+
+    assert res.status_code == 200
+    assert res.json() == {"liked": [post_ids[0], post_ids[2]]}
+    assert len(query_counter) == 1
+
+def test_liked_comments_lookup(authorized_client, test_comment):
+    comment_id = test_comment["comment_id"]
+    assert authorized_client.get("/likes/comments", params={"ids": [comment_id]}).json() == {"liked": []}
+
+    authorized_client.post(f"/likes/comments/{comment_id}")
+    assert authorized_client.get("/likes/comments", params={"ids": [comment_id]}).json() == {"liked": [comment_id]}
+
+def test_liked_lookup_limits_ids(authorized_client):
+    res = authorized_client.get("/likes/posts", params={"ids": list(range(501))})
+    assert res.status_code == 422
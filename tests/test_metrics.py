@@ -0,0 +1,29 @@
+def test_metrics(client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    client.get(f"/posts/{post_id}")
+    client.get("/posts/999999")
+    client.get("/no-such-route")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = res.text.splitlines()
+    samples = dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+    assert int(samples['http_requests_total{method="GET",route="/posts/{id}",status="200"}']) >= 1
+    assert int(samples['http_requests_total{method="GET",route="/posts/{id}",status="404"}']) >= 1
+    assert int(samples['http_requests_total{method="GET",route="unmatched",status="404"}']) >= 1
+    assert int(samples['http_requests_total{method="POST",route="/posts/",status="201"}']) >= 3
+
+    labels = 'method="GET",route="/posts/{id}"'
+    buckets = [int(value) for sample, value in samples.items() if sample.startswith(f"http_request_duration_seconds_bucket{{{labels},")]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == int(samples[f"http_request_duration_seconds_count{{{labels}}}"])
+    assert float(samples[f"http_request_duration_seconds_sum{{{labels}}}"]) > 0
+
+    # This scrape is in flight itself.
+    assert int(samples["http_requests_in_flight"]) >= 1
+    assert 'db_pool_checked_out{pool="primary"}' in samples
+    # Registering the test user hashed its password.
+    assert int(samples["password_hash_seconds_count"]) >= 1
+    assert 'response_cache_hits_total{level="l1"}' in samples
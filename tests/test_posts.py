@@ -1,4 +1,8 @@
-from app import schemas
+import asyncio
+from app import schemas, models
+import pytest
+from app.services.cache_service import TTLCache
+from app.services.response_cache_service import response_cache, MemoryStore, ResponseCache
 
 def test_get_all_posts(authorized_client, test_posts):
     res = authorized_client.get("/posts")
@@ -88,3 +92,139 @@ def test_pagination(authorized_client, test_posts):
     assert res.status_code == 200
     assert len(paginated_posts) == limit
     assert paginated_posts[0]["post_id"] == test_posts[skip]["post_id"]
+
+@pytest.mark.parametrize("page_size", [1, 5, 20])
+def test_get_posts_query_count(client, session, test_user, query_counter, page_size):
+    session.add_all([models.BlogPost(title=f"Post {i}", content="Content", user_id=test_user['user_id']) for i in range(20)])
+    session.commit()
+    query_counter.clear()
+
+    res = client.get(f"/posts?limit={page_size}")
+
+    assert res.status_code == 200
+    assert len(res.json()) == page_size
+    # Authors come with the posts, not one query per row.
+    assert len(query_counter) == 1
+
+def test_cursor_pagination(authorized_client, test_posts):
+    res = authorized_client.get("/posts?limit=2")
+    first_page = res.json()
+    assert [post["post_id"] for post in first_page] == [post["post_id"] for post in test_posts[:2]]
+
+    # A post created while paging shows up at the end instead of shifting the pages.
+    authorized_client.post("/posts/", json={"title": "Post 4 Title", "content": "Post 4 Content"})
+
+    res = authorized_client.get(f"/posts?limit=2&cursor={res.headers['X-Next-Cursor']}")
+    second_page = res.json()
+    assert [post["post_id"] for post in second_page] == [test_posts[2]["post_id"], test_posts[2]["post_id"] + 1]
+
+    res = authorized_client.get(f"/posts?limit=2&cursor={res.headers['X-Next-Cursor']}")
+    assert res.json() == []
+    assert "X-Next-Cursor" not in res.headers
+
+def test_invalid_cursor(authorized_client, test_posts):
+    res = authorized_client.get("/posts?cursor=not-a-cursor")
+    assert res.status_code == 400
+
+def test_search_matches_title(authorized_client, test_posts):
+    authorized_client.post("/posts/", json={"title": "Scaling Postgres", "content": "Notes on indexes"})
+    res = authorized_client.get("/posts?search=postgres")
+
+    assert res.status_code == 200
+    assert [post["title"] for post in res.json()] == ["Scaling Postgres"]
+
+def test_empty_search_returns_all_posts(authorized_client, test_posts):
+    res = authorized_client.get("/posts?search=")
+    assert len(res.json()) == len(test_posts)
+
+def test_ranked_search(authorized_client, test_posts):
+    authorized_client.post("/posts/", json={"title": "Gardening", "content": "Tomatoes need sun"})
+    authorized_client.post("/posts/", json={"title": "Tomatoes", "content": "Growing tomatoes, more tomatoes"})
+    res = authorized_client.get("/posts/search?q=tomatoes")
+
+    assert res.status_code == 200
+    assert [post["title"] for post in res.json()] == ["Tomatoes", "Gardening"]
+
+def test_ranked_search_requires_query(authorized_client):
+    res = authorized_client.get("/posts/search?q=")
+    assert res.status_code == 422
+
+def test_get_one_post_cached(authorized_client, test_posts, query_counter):
+    post_id = test_posts[0]["post_id"]
+    first = authorized_client.get(f"/posts/{post_id}")
+    query_counter.clear()
+
+    second = authorized_client.get(f"/posts/{post_id}")
+    assert second.json() == first.json()
+    assert query_counter == []
+
+    authorized_client.put(f"/posts/{post_id}", json={"title": "Edited", "content": "Edited content"})
+    assert authorized_client.get(f"/posts/{post_id}").json()["title"] == "Edited"
+
+    authorized_client.post(f"/likes/posts/{post_id}")
+    assert authorized_client.get(f"/posts/{post_id}").json()["like_count"] == 1
+
+    authorized_client.delete(f"/posts/{post_id}")
+    assert authorized_client.get(f"/posts/{post_id}").status_code == 404
+
+def test_get_one_post_shared_cache(client, test_posts, monkeypatch):
+    monkeypatch.setattr(response_cache, "l2", MemoryStore(100, 60))
+    post_id = test_posts[0]["post_id"]
+    client.get(f"/posts/{post_id}")
+    l2_hits = response_cache.l2_hits
+
+    # As seen from another worker, whose own L1 is empty.
+    response_cache.clear()
+    res = client.get(f"/posts/{post_id}")
+    assert res.json()["post_id"] == post_id
+    assert response_cache.l2_hits == l2_hits + 1
+
+def test_fill_racing_an_invalidation_is_dropped():
+    cache = ResponseCache(TTLCache(10, 60))
+
+    async def fill_while_invalidated():
+        async with cache.filling("post:1") as fill:
+            # The post is edited while its old version is being read.
+            await cache.invalidate("post:1")
+            await fill(b"old")
+        assert await cache.get("post:1") is None
+
+        async with cache.filling("post:1") as fill:
+            await fill(b"new")
+        assert await cache.get("post:1") == b"new"
+
+    asyncio.run(fill_while_invalidated())
+
+def test_get_one_post_not_modified(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    res = authorized_client.get(f"/posts/{post_id}")
+    etag = res.headers["ETag"]
+    assert res.headers["Last-Modified"].endswith("GMT")
+
+    res = authorized_client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+    assert res.content == b""
+
+    authorized_client.post(f"/likes/posts/{post_id}")
+    res = authorized_client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+def test_get_posts_not_modified(authorized_client, test_posts, query_counter):
+    etag = authorized_client.get("/posts?limit=2").headers["ETag"]
+    query_counter.clear()
+
+    res = authorized_client.get("/posts?limit=2", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    # Only the version query ran.
+    assert len(query_counter) == 1
+
+    authorized_client.put(f"/posts/{test_posts[1]['post_id']}", json={"title": "Edited", "content": "Edited"})
+    res = authorized_client.get("/posts?limit=2", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()[1]["title"] == "Edited"
+    # Posts past the page don't change its ETag.
+    etag = res.headers["ETag"]
+    authorized_client.put(f"/posts/{test_posts[2]['post_id']}", json={"title": "Edited", "content": "Edited"})
+    assert authorized_client.get("/posts?limit=2", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,26 @@
+import logging
+from app.services.profiling_service import sql_profiler, normalize_sql
+
+
+def test_profiling_headers(client, test_posts, monkeypatch):
+    assert "X-DB-Queries" not in client.get("/posts").headers
+
+    monkeypatch.setattr(sql_profiler, "sample_rate", 1.0)
+    res = client.get("/posts")
+    assert res.headers["X-DB-Queries"] == "1"
+    assert float(res.headers["X-DB-Time"]) > 0
+
+    res = client.get(f"/comments/posts/{test_posts[0]['post_id']}")
+    # The post lookup and the comments page.
+    assert res.headers["X-DB-Queries"] == "2"
+
+def test_slow_query_log(client, test_posts, monkeypatch, caplog):
+    monkeypatch.setattr(sql_profiler, "sample_rate", 1.0)
+    monkeypatch.setattr(sql_profiler, "slow_query_seconds", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="app.services.profiling_service"):
+        client.get("/posts?limit=5")
+    assert any("GET /posts/" in record.getMessage() and "FROM blog_posts" in record.getMessage() for record in caplog.records)
+
+def test_normalize_sql():
+    statement = "SELECT *\n  FROM blog_posts WHERE post_id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER) AND title = 'it''s' LIMIT 10"
+    assert normalize_sql(statement) == "SELECT * FROM blog_posts WHERE post_id IN (?, ...) AND title = ? LIMIT ?"
@@ -0,0 +1,41 @@
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+from pydantic import TypeAdapter
+from app import schemas
+from app.serializers import compile_serializer, dump_json, serialize_post, serialize_comment, serialize_user_public
+
+
+author = SimpleNamespace(username="zoë", first_name="Ünïcode   😀", last_name='"quoted" \\ \x00\x1f</script>')
+post = SimpleNamespace(post_id=2**40, title="Tab\tand\nnewline", content="é" * 100, like_count=-1,
+                       created_at=datetime(2024, 2, 29, 23, 59, 59, 999999), updated_at=datetime(2024, 3, 1), author=author)
+comment = SimpleNamespace(comment_id=1, blog_post_id=2, content="", like_count=0,
+                          created_at=datetime(2024, 1, 1, 0, 0, 0, 500), updated_at=datetime(2024, 1, 1, 12), author=author)
+
+
+@pytest.mark.parametrize("serializer, schema, obj", [
+    (serialize_post, schemas.PostReturn, post),
+    (serialize_comment, schemas.CommentReturn, comment),
+    (serialize_user_public, schemas.UserOutPublic, author),
+])
+def test_serializer_matches_pydantic(serializer, schema, obj):
+    assert dump_json(serializer, obj) == schema.model_validate(obj, from_attributes=True).model_dump_json().encode()
+
+def test_unsupported_field_type():
+    with pytest.raises(TypeError):
+        compile_serializer(schemas.UserOut)
+
+def test_list_endpoint_bytes_match_pydantic(client, authorized_client, test_posts):
+    authorized_client.post(f"/comments/posts/{test_posts[0]['post_id']}", json={"content": "Ça va? 👍"})
+    for path, schema in [
+        ("/posts/", schemas.PostReturn),
+        ("/posts/search?q=post", schemas.PostReturn),
+        (f"/comments/posts/{test_posts[0]['post_id']}", schemas.CommentReturn),
+    ]:
+        res = client.get(path)
+        assert res.status_code == 200
+        assert res.headers["content-type"] == "application/json"
+        assert "etag" in res.headers
+        adapter = TypeAdapter(List[schema])
+        assert res.content == adapter.dump_json(adapter.validate_json(res.content))
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app import models
+from app.services.oauth2_service import create_jwt_token
+from app.services.trending_service import TrendingScorer, refresh_trending
+from .conftest import AsyncTestingSessionLocal
+
+
+def test_trending_posts(client, test_posts, token, token2, admin_user):
+    post_ids = [post["post_id"] for post in test_posts]
+    auth = {"Authorization": f"bearer {token.access_token}"}
+    client.post(f"/likes/posts/{post_ids[1]}", headers=auth)
+    client.post(f"/likes/posts/{post_ids[1]}", headers={"Authorization": f"bearer {token2.access_token}"})
+    client.post(f"/comments/posts/{post_ids[2]}", json={"content": "Worth three likes"}, headers=auth)
+
+    admin_auth = {"Authorization": f"bearer {create_jwt_token(data={'user_id': admin_user['user_id']})}"}
+    res = client.post("/admin/trending/refresh", headers=admin_auth)
+    assert res.status_code == 200
+    assert res.json() == {"ranked_posts": 2}
+
+    res = client.get("/posts/trending")
+    assert res.status_code == 200
+    assert [post["post_id"] for post in res.json()] == [post_ids[2], post_ids[1]]
+    assert res.json()[1]["like_count"] == 2
+    assert [post["post_id"] for post in client.get("/posts/trending?limit=1&skip=1").json()] == [post_ids[1]]
+
+    res = client.get("/posts/trending", headers={"If-None-Match": res.headers["etag"]})
+    assert res.status_code == 304
+
+    # Deleted posts leave the snapshot right away.
+    client.delete(f"/posts/{post_ids[2]}", headers=auth)
+    assert [post["post_id"] for post in client.get("/posts/trending").json()] == [post_ids[1]]
+
+def test_refresh_trending_requires_admin(authorized_client):
+    res = authorized_client.post("/admin/trending/refresh")
+    assert res.status_code == 403
+
+def test_trending_scores_decay(session, test_posts):
+    post_id = test_posts[0]["post_id"]
+    scorer = TrendingScorer(half_life_seconds=3600, like_weight=1, comment_weight=3, min_score=0.1)
+    now = datetime.now() + timedelta(minutes=1)
+
+    async def refresh(at):
+        async with AsyncTestingSessionLocal() as db:
+            return await refresh_trending(db, scorer, now=at)
+
+    session.add(models.Comment(user_id=1, blog_post_id=post_id, content="Hot", created_at=now - timedelta(hours=1)))
+    session.commit()
+    assert asyncio.run(refresh(now)) == 1
+    assert session.get(models.PostTrending, post_id).score == pytest.approx(1.5)
+
+    # Two more half-lives, and one like in between.
+    session.add(models.PostsLike(user_id=1, blog_post_id=post_id, created_at=now + timedelta(hours=1)))
+    session.commit()
+    asyncio.run(refresh(now + timedelta(hours=2)))
+    session.expire_all()
+    assert session.get(models.PostTrending, post_id).score == pytest.approx(1.5 / 4 + 0.5)
+
+    # Decayed under min_score, the post leaves the ranking.
+    assert asyncio.run(refresh(now + timedelta(hours=6))) == 0
+
+def test_trending_scores_decay_across_a_gap_longer_than_the_horizon(session, test_posts):
+    post_id = test_posts[0]["post_id"]
+    scorer = TrendingScorer(half_life_seconds=3600, like_weight=1, comment_weight=1, min_score=0.1)
+    now = datetime.now() + timedelta(minutes=1)
+    session.add(models.PostTrending(blog_post_id=post_id, score=100))
+    session.add(models.TrendingRefresh(id=1, refreshed_at=now))
+    session.commit()
+
+    async def refresh(at):
+        async with AsyncTestingSessionLocal() as db:
+            return await refresh_trending(db, scorer, now=at)
+
+    # 10 half-lives leave 100 / 1024, under min_score, though the horizon is under 4 hours.
+    assert asyncio.run(refresh(now + timedelta(hours=10))) == 0
+
+def test_trending_min_score_must_be_positive():
+    with pytest.raises(ValueError):
+        TrendingScorer(half_life_seconds=3600, like_weight=1, comment_weight=3, min_score=0)
@@ -1,6 +1,9 @@
+import asyncio
+import json
 from app import schemas
 import jwt
 from app.config import settings
+from app.services.oauth2_service import create_jwt_token, invalidate_user, load_user, user_cache
 import pytest
 
 def test_register_user(client):
@@ -143,4 +146,130 @@ def test_admin_delete_user(admin_client, session, test_user):
 # Test deleting a non-existent user as admin
 def test_admin_delete_non_existent_user(admin_client, session):
     res = admin_client.delete("/users/nonexistentuser")
-    assert res.status_code == 404
\ No newline at end of file
+    assert res.status_code == 404
+
+# Test that a cached user is dropped once the account is deleted
+def test_deleted_user_token_rejected(client, admin_user, test_user, token):
+    user_headers = {"Authorization": f"{token.token_type} {token.access_token}"}
+    res = client.post("/posts/", json={"title": "Title", "content": "Content"}, headers=user_headers)
+    assert res.status_code == 201
+
+    admin_res = client.post("/login", data={"username": admin_user['username'], "password": admin_user['password']})
+    admin_headers = {"Authorization": f"bearer {admin_res.json()['access_token']}"}
+    res = client.delete(f"/users/{test_user['username']}", headers=admin_headers)
+    assert res.status_code == 204
+
+    res = client.post("/posts/", json={"title": "Title", "content": "Content"}, headers=user_headers)
+    assert res.status_code == 401
+
+def test_cached_user_skips_lookup(client, test_user, token, query_counter):
+    headers = {"Authorization": f"{token.token_type} {token.access_token}"}
+    client.get("/likes/posts", params={"ids": [1]}, headers=headers)
+    query_counter.clear()
+
+    res = client.get("/likes/posts", params={"ids": [1]}, headers=headers)
+    assert res.status_code == 200
+    # Only the likes are looked up, the user comes from the cache.
+    assert len(query_counter) == 1
+
+    invalidate_user(test_user['user_id'])
+    query_counter.clear()
+    client.get("/likes/posts", params={"ids": [1]}, headers=headers)
+    assert len(query_counter) == 2
+
+def test_user_changed_during_lookup_not_cached(session, test_user):
+    class ChangedWhileRead:
+        async def get(self, model, user_id):
+            user = session.get(model, user_id)
+            invalidate_user(user_id)
+            return user
+
+    user = asyncio.run(load_user(test_user['user_id'], ChangedWhileRead()))
+    assert user.user_id == test_user['user_id']
+    assert user_cache.get(test_user['user_id']) is None
+
+def test_login_claims_mode(client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "jwt_claims_mode", True)
+    res = client.post("/login", data = {
+                          "username": test_user['username'],
+                          "password": test_user['password']
+                      })
+    login_res = schemas.Token(**res.json())
+    payload = jwt.decode(login_res.access_token, settings.secret_key, algorithms=[settings.algorithm])
+    assert payload.get("user_id") == test_user['user_id']
+    assert payload.get("username") == test_user['username']
+    assert payload.get("admin") is False
+
+def test_claims_token_skips_user_lookup(client, monkeypatch):
+    monkeypatch.setattr(settings, "jwt_claims_mode", True)
+    # No user 9999 exists, so this only passes if the principal comes from the claims.
+    access_token = create_jwt_token(data={"user_id": 9999, "username": "ghost", "admin": True})
+    res = client.get("/admin/pool", headers={"Authorization": f"bearer {access_token}"})
+    assert res.status_code == 200
+
+def test_claims_not_trusted_outside_claims_mode(client):
+    access_token = create_jwt_token(data={"user_id": 9999, "username": "ghost", "admin": True})
+    res = client.get("/admin/pool", headers={"Authorization": f"bearer {access_token}"})
+    assert res.status_code == 401
+
+def test_deleted_user_claims_token_writes_rejected(client, test_user, test_posts, monkeypatch):
+    monkeypatch.setattr(settings, "jwt_claims_mode", True)
+    post_id = test_posts[0]["post_id"]
+    access_token = create_jwt_token(data={"user_id": 9999, "username": "ghost", "admin": False})
+    headers = {"Authorization": f"bearer {access_token}"}
+    assert client.post("/posts/", json={"title": "Title", "content": "Content"}, headers=headers).status_code == 401
+    assert client.post(f"/comments/posts/{post_id}", json={"content": "Content"}, headers=headers).status_code == 401
+    assert client.post(f"/likes/posts/{post_id}", headers=headers).status_code == 401
+
+def test_plain_token_for_missing_user_rejected(client):
+    access_token = create_jwt_token(data={"user_id": 9999})
+    res = client.get("/admin/pool", headers={"Authorization": f"bearer {access_token}"})
+    assert res.status_code == 401
+
+def test_admin_list_users_paginated(admin_client, test_user2):
+    res = admin_client.get("/users?limit=2")
+    assert res.status_code == 200
+    assert [user["username"] for user in res.json()] == ["adminuser", "maher"]
+
+    res = admin_client.get(f"/users?limit=2&cursor={res.headers['X-Next-Cursor']}")
+    assert [user["username"] for user in res.json()] == ["maher2"]
+    assert "X-Next-Cursor" not in res.headers
+
+def test_admin_list_users_filters(admin_client, test_user2):
+    res = admin_client.get("/users?search=MAHER2")
+    assert [user["username"] for user in res.json()] == ["maher2"]
+
+    res = admin_client.get("/users?search=adminuser@")
+    assert [user["username"] for user in res.json()] == ["adminuser"]
+
+    res = admin_client.get("/users?search=%25")
+    assert res.json() == []
+
+    res = admin_client.get("/users?admin=true")
+    assert [user["username"] for user in res.json()] == ["adminuser"]
+
+def test_admin_export_users_ndjson(admin_client, test_user2):
+    res = admin_client.get("/users?format=ndjson&limit=1")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    users = [schemas.UserOut.model_validate_json(line) for line in res.text.splitlines()]
+    assert [user.username for user in users] == ["adminuser", "maher", "maher2"]
+
+def test_export_current_user(authorized_client, test_posts):
+    post_id = test_posts[0]["post_id"]
+    comment = authorized_client.post(f"/comments/posts/{post_id}", json={"content": "Mine"}).json()
+    authorized_client.post(f"/likes/posts/{post_id}")
+    authorized_client.post(f"/likes/comments/{comment['comment_id']}")
+
+    res = authorized_client.get("/users/me/export")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert [line["type"] for line in lines] == ["post", "post", "post", "comment", "post_like", "comment_like"]
+    assert lines[0]["post_id"] == post_id
+    assert lines[0]["like_count"] == 1
+    assert lines[3]["content"] == "Mine"
+    assert lines[5]["comment_id"] == comment["comment_id"]
+
+def test_export_requires_login(client):
+    assert client.get("/users/me/export").status_code == 401